@@ -2,6 +2,7 @@
 Database connection configuration
 """
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
@@ -21,6 +22,25 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers used for the request path (sync URL scheme -> async scheme)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url):
+    """Swap a sync database URL's driver for its async counterpart"""
+    scheme, separator, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}{separator}{rest}"
+
+# Async engine and session factory for the API routers
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 # Dependency to get database session
 def get_db():
     """Get database session"""
@@ -30,9 +50,32 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get async database session
+async def get_async_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Initialize database tables
 def init_db():
     """Create all database tables"""
     from app.models import Base
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    # Backfill rollups and sketches the first time their tables appear next to existing data
+    from app.services.rollups import rebuild_rollups, rollups_missing
+    from app.services.sketches import rebuild_sketches, sketches_missing
+    db = SessionLocal()
+    try:
+        if rollups_missing(db):
+            rebuild_rollups(db)
+        if sketches_missing(db):
+            rebuild_sketches(db)
+    finally:
+        db.close()
     print("✅ Database initialized")
\ No newline at end of file
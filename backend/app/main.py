@@ -2,10 +2,17 @@
 """
 Rehabit Backend API with ML Integration
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import sys
-import os
+from fastapi.responses import JSONResponse, Response
+from app.database import engine, async_engine
+from app.routers import users, activities, predictions, recommendations, alerts
+from app.services import ml_services
+from app.services.activity_cache import activity_cache
+from app.services.dashboard_cache import dashboard_cache
+from app.services.metrics import CONTENT_TYPE, MetricsMiddleware, cache_metrics, instrument_engine, metrics
+from app.services.profiling import dashboard_profiler
 
 # Create FastAPI app
 app = FastAPI(
@@ -21,16 +28,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# ML Service
-ml_service = None
+# Request latency per route, database query timings and cache counters for /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+def model_cache_stats():
+    """Per-user model registry counters (None until the models have loaded)"""
+    service = ml_services.ml_service
+    if service is None or service.registry is None:
+        return None
+    stats = service.registry.stats()
+    stats['entries'] = stats.pop('users')
+    return stats
+
+cache_metrics({
+    'activity': activity_cache.stats,
+    'dashboard': dashboard_cache.stats,
+    'models': model_cache_stats,
+})
+
+# API routers
+app.include_router(users.router, prefix="/api/users", tags=["Users"])
+app.include_router(activities.router, prefix="/api/activities", tags=["Activities"])
+app.include_router(predictions.router, prefix="/api/predictions", tags=["Predictions"])
+app.include_router(recommendations.router, prefix="/api/recommendations", tags=["Recommendations"])
+app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"])
 
 @app.on_event("startup")
 def startup_event():
-    """Initialize ML service and database on startup"""
-    global ml_service
-    
+    """Initialize the database and start loading ML models on startup"""
     # Initialize database
     try:
         from app.database import init_db
@@ -38,67 +68,9 @@ def startup_event():
     except Exception as e:
         print(f"⚠️  Database initialization skipped: {e}")
     
-    # Initialize ML service
-    try:
-        # Get correct path to ml directory
-        # backend/app/main.py -> backend/app -> backend -> Rehabit -> ml
-        current_file = os.path.abspath(__file__)  # .../backend/app/main.py
-        app_dir = os.path.dirname(current_file)   # .../backend/app
-        backend_dir = os.path.dirname(app_dir)    # .../backend
-        project_dir = os.path.dirname(backend_dir) # .../Rehabit
-        ml_path = os.path.join(project_dir, 'ml')  # .../Rehabit/ml
-        
-        sys.path.insert(0, ml_path)
-        print(f"✅ ML Path: {ml_path}")
-        
-        from models.productivity_predictor import ProductivityPredictor
-        from models.pattern_recognition import PatternRecognizer
-        from models.anomaly_detection import AnomalyDetector
-        from models.recommendation_engine import RecommendationEngine
-        import pandas as pd
-        
-        class MLService:
-            def __init__(self):
-                print("🤖 Initializing ML Service...")
-                self.predictor = ProductivityPredictor()
-                self.recognizer = PatternRecognizer()
-                self.detector = AnomalyDetector()
-                self.engine = RecommendationEngine()
-                self.ml_path = ml_path
-                
-                models_dir = os.path.join(ml_path, 'saved_models')
-                self.predictor.load_model(os.path.join(models_dir, 'productivity_model.pkl'))
-                self.recognizer.load_model(os.path.join(models_dir, 'pattern_model.pkl'))
-                self.detector.load_model(os.path.join(models_dir, 'anomaly_model.pkl'))
-                print("✅ All ML models loaded successfully")
-            
-            def get_dashboard_data(self, user_id):
-                import pandas as pd
-                demo_path = os.path.join(self.ml_path, 'data', 'demo_activities.csv')
-                user_data = pd.read_csv(demo_path)
-                
-                predictions = self.predictor.predict(periods=24)
-                pattern = self.recognizer.predict_pattern(user_data)
-                anomaly = self.detector.detect(user_data)
-                recommendations = self.engine.generate_recommendations(
-                    user_data, predictions, pattern, anomaly
-                )
-                
-                return {
-                    'predictions': predictions.to_dict('records'),
-                    'pattern': pattern,
-                    'anomaly': anomaly,
-                    'recommendations': recommendations
-                }
-        
-        ml_service = MLService()
-        print("🚀 Rehabit API started successfully with ML models")
-        
-    except Exception as e:
-        print(f"⚠️  ML Service failed: {e}")
-        print("   Dashboard will use fallback data")
-        import traceback
-        traceback.print_exc()
+    # Load ML models in the background; the dashboard uses fallback data until /ready
+    ml_services.start_loading()
+    print("🚀 Rehabit API started, ML models loading in the background")
 
 # Root endpoint
 @app.get("/")
@@ -107,26 +79,67 @@ def root():
         "message": "Welcome to Rehabit API",
         "version": "1.0.0",
         "status": "running",
-        "ml_loaded": ml_service is not None,
+        "ml_loaded": ml_services.ml_service is not None,
         "endpoints": {
             "dashboard": "/api/dashboard/1",
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
-# Health endpoint
+# Liveness: the process is up and serving requests
 @app.get("/health")
 def health():
     return {
         "status": "healthy",
-        "ml_loaded": ml_service is not None
+        "ml_loaded": ml_services.ml_service is not None
     }
 
+# Readiness: ML models are loaded (503 while loading or after a failed load)
+@app.get("/ready")
+def ready():
+    body = {
+        "ready": ml_services.ml_status == 'ready',
+        "ml_status": ml_services.ml_status,
+        "load_seconds": ml_services.ml_load_seconds,
+    }
+    if ml_services.ml_error:
+        body["error"] = ml_services.ml_error
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+def build_ml_data(ml_service, user_id, profiling):
+    """
+    Run the ML pipeline for a dashboard (blocking: database reads, model
+    loads, forecasts), under the profiler when requested
+    
+    Returns:
+        (ml_data, profile summary or None)
+    """
+    if not profiling:
+        return ml_service.get_dashboard_data(user_id), None
+    
+    # cProfile only sees the thread it is enabled on, so profile in here
+    with dashboard_profiler.profile(f"user{user_id}") as profile:
+        ml_data = ml_service.get_dashboard_data(user_id)
+    return ml_data, profile
+
 # Dashboard endpoint
 @app.get("/api/dashboard/{user_id}")
-async def get_dashboard(user_id: int):
-    """Get complete dashboard data with ML insights"""
+async def get_dashboard(user_id: int, request: Request):
+    """
+    Get complete dashboard data with ML insights
+    
+    With DASHBOARD_PROFILING enabled, an `X-Rehabit-Profile: 1` header
+    rebuilds the dashboard under cProfile and adds a `profile` call-tree
+    summary to the response (the full profile is saved to DASHBOARD_PROFILE_DIR).
+    """
     
     # Basic stats
     stats = {
@@ -140,21 +153,35 @@ async def get_dashboard(user_id: int):
         'weekly_change': 15.3,
     }
     
-    # Try to get ML data
+    # Try to get ML data (None while models are still loading)
+    ml_service = ml_services.ml_service
+    profiling = dashboard_profiler.requested(request.headers)
     if ml_service:
+        # Reuse the last payload until the user logs something new
+        # (profiled requests always rebuild, that is what they measure)
+        cached = None if profiling else dashboard_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
             print(f"🔮 Getting ML data for user {user_id}")
-            ml_data = ml_service.get_dashboard_data(user_id)
-            return {
-                'status': 'success',
-                'data': {
-                    'stats': stats,
-                    'predictions': ml_data['predictions'],
-                    'pattern': ml_data['pattern'],
-                    'anomaly': ml_data['anomaly'],
-                    'recommendations': ml_data['recommendations']
+            with dashboard_cache.building(user_id) as version:
+                # Off the event loop, so other requests and alert streams keep flowing
+                ml_data, profile = await run_in_threadpool(build_ml_data, ml_service, user_id, profiling)
+                payload = {
+                    'status': 'success',
+                    'data': {
+                        'stats': stats,
+                        'predictions': ml_data['predictions'],
+                        'pattern': ml_data['pattern'],
+                        'anomaly': ml_data['anomaly'],
+                        'recommendations': ml_data['recommendations']
+                    }
                 }
-            }
+                dashboard_cache.put(user_id, payload, version)
+            if profiling:
+                return {**payload, 'profile': profile}
+            return payload
         except Exception as e:
             print(f"❌ ML error: {e}")
             import traceback
@@ -2,7 +2,7 @@
 Database Models for Rehabit
 Defines the structure of our database tables
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -37,6 +37,55 @@ class Activity(Base):
     
     # Relationship: activity belongs to one user
     user = relationship("User", back_populates="activities")
+    
+    # Per-user history is always read newest-first by (timestamp, id)
+    __table_args__ = (
+        Index("ix_activities_user_timestamp", "user_id", "timestamp", "id"),
+    )
+
+
+class ActivityHourly(Base):
+    """Hourly activity rollup, updated as activities are logged"""
+    __tablename__ = "activity_hourly"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start of the hour
+    activity_count = Column(Integer, default=0)
+    score_count = Column(Integer, default=0)  # activities with a productivity score
+    productivity_sum = Column(Float, default=0.0)
+
+
+class ActivityDaily(Base):
+    """Daily activity rollup, updated as activities are logged"""
+    __tablename__ = "activity_daily"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    activity_count = Column(Integer, default=0)
+    score_count = Column(Integer, default=0)
+    productivity_sum = Column(Float, default=0.0)
+    work_minutes = Column(Integer, default=0)
+    break_count = Column(Integer, default=0)
+    late_work_minutes = Column(Integer, default=0)  # work starting at/after 8 PM
+
+
+class AlertRaised(Base):
+    """Burnout alerts already sent, one per user, day and type (shared by every worker)"""
+    __tablename__ = "alerts_raised"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    alert_type = Column(String, primary_key=True)
+    raised_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ActivitySketch(Base):
+    """Per-user hourly productivity sketch (see ml/models/hourly_sketch.py)"""
+    __tablename__ = "activity_sketches"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    data = Column(LargeBinary, nullable=False)  # HourlySketch.to_bytes()
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Prediction(Base):
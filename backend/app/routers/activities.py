@@ -1,16 +1,70 @@
 """
 Activity logging endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+import json
 from app import models, schemas
-from app.database import get_db
+from app.database import get_async_db
+from app.services import activity_events
+from app.services.activity_cache import activity_cache, ACTIVITY_COLUMNS
+from app.services.activity_store import activity_store, append_activities, drop_stored_user
+from app.services.alert_stream import check_burnout
+from app.services.dashboard_cache import dashboard_cache
+from app.services.rollups import apply_rollups
+from app.services.sketches import apply_sketches
 
 router = APIRouter()
 
+# Upper bound on records accepted by a single /bulk request
+BULK_MAX_ROWS = 5000
+
+def publish_new_activities(user_id, records):
+    """
+    Bring a user's in-memory views up to date after activities are committed
+    
+    The rows are already committed, so nothing here may fail the request:
+    a view that cannot take the new rows is dropped and rebuilt from the
+    database on its next read instead.
+    """
+    dashboard_cache.invalidate(user_id)
+    try:
+        activity_cache.append(user_id, records)
+    except Exception as e:
+        print(f"⚠️  Activity cache append failed for user {user_id}: {e}")
+        activity_cache.invalidate(user_id)
+    try:
+        append_activities(activity_store, user_id, records, ACTIVITY_COLUMNS)
+    except Exception as e:
+        print(f"⚠️  Activity store append failed for user {user_id}: {e}")
+        drop_stored_user(activity_store, user_id)
+    try:
+        activity_events.publish(user_id, records)
+    except Exception as e:
+        print(f"⚠️  Activity event delivery failed for user {user_id}: {e}")
+
+async def after_commit(db, records):
+    """Publish committed activities and push any burnout alerts they triggered"""
+    by_user = {}
+    for record in records:
+        by_user.setdefault(record["user_id"], []).append(record)
+    for user_id, user_records in by_user.items():
+        # Frame concat/sort, Arrow writes and forecaster updates are blocking
+        # work, so they run off the event loop
+        await run_in_threadpool(publish_new_activities, user_id, user_records)
+    
+    try:
+        await check_burnout(db, records)
+    except Exception as e:
+        print(f"⚠️  Burnout check failed: {e}")
+
 @router.post("/log", response_model=schemas.ActivityResponse)
-def log_activity(activity: schemas.ActivityCreate, db: Session = Depends(get_db)):
+async def log_activity(activity: schemas.ActivityCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Log a new activity
     
@@ -21,27 +75,182 @@ def log_activity(activity: schemas.ActivityCreate, db: Session = Depends(get_db)
     - **focus_level**: low, medium, or high
     """
     # Verify user exists
-    user = db.query(models.User).filter(models.User.id == activity.user_id).first()
+    user = await db.scalar(select(models.User).where(models.User.id == activity.user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Create activity
-    new_activity = models.Activity(**activity.dict())
+    # Create activity (stamped now unless the client sent a timestamp)
+    record = activity.dict()
+    record["timestamp"] = record["timestamp"] or datetime.utcnow()
+    new_activity = models.Activity(**record)
     db.add(new_activity)
-    db.commit()
-    db.refresh(new_activity)
+    await apply_rollups(db, [record])
+    await apply_sketches(db, [record])
+    await db.commit()
+    await db.refresh(new_activity)
+    
+    # Keep the in-memory history used by the dashboard up to date and push
+    # any burnout alert this activity triggered
+    await after_commit(db, [
+        {column: getattr(new_activity, column) for column in ACTIVITY_COLUMNS}
+    ])
     return new_activity
 
+async def read_bulk_records(request: Request):
+    """
+    Yield raw records from a bulk upload body
+    
+    NDJSON bodies (application/x-ndjson) are parsed line by line as they
+    stream in; anything else is read as a single JSON array.
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" in content_type or "jsonl" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    
+    try:
+        records = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    for record in records:
+        yield record
+
+def parse_bulk_record(record):
+    """Validate one bulk record, returning (ActivityCreate, None) or (None, error)"""
+    if isinstance(record, bytes):
+        try:
+            record = json.loads(record)
+        except ValueError:
+            return None, "Invalid JSON"
+    if not isinstance(record, dict):
+        return None, "Record must be a JSON object"
+    
+    try:
+        return schemas.ActivityCreate(**record), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+
+async def insert_bulk_activities(db: AsyncSession, parsed):
+    """Insert all valid records in one transaction; returns per-row results"""
+    results = [None] * len(parsed)
+    
+    # Verify every referenced user with a single query
+    user_ids = {activity.user_id for activity, _ in parsed if activity is not None}
+    known_users = set(
+        await db.scalars(select(models.User.id).where(models.User.id.in_(user_ids)))
+    ) if user_ids else set()
+    
+    now = datetime.utcnow()
+    rows = []
+    for index, (activity, error) in enumerate(parsed):
+        if activity is not None and activity.user_id not in known_users:
+            error = "User not found"
+        if error is not None:
+            results[index] = schemas.ActivityBulkRowStatus(index=index, status="error", detail=error)
+            continue
+        
+        row = activity.dict()
+        row["timestamp"] = row["timestamp"] or now
+        rows.append(row)
+        results[index] = schemas.ActivityBulkRowStatus(index=index, status="created")
+    
+    if rows:
+        # List of parameter sets -> executemany
+        await db.execute(insert(models.Activity), rows)
+        await apply_rollups(db, rows)
+        await apply_sketches(db, rows)
+        await db.commit()
+        await after_commit(db, rows)
+    
+    return schemas.ActivityBulkResponse(
+        created=len(rows),
+        failed=len(parsed) - len(rows),
+        results=results
+    )
+
+@router.post("/bulk", response_model=schemas.ActivityBulkResponse)
+async def log_activities_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Log many activities in one request
+    
+    Accepts either a JSON array of activity objects or an NDJSON stream
+    (`Content-Type: application/x-ndjson`, one object per line), each with
+    the same fields as **/log** plus an optional **timestamp**. Valid rows are
+    inserted in a single transaction; invalid rows are reported per index
+    and skipped.
+    """
+    parsed = []
+    async for record in read_bulk_records(request):
+        if len(parsed) >= BULK_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BULK_MAX_ROWS} activities per request"
+            )
+        parsed.append(parse_bulk_record(record))
+    
+    return await insert_bulk_activities(db, parsed)
+
+def encode_cursor(activity):
+    """Build a paging cursor '<timestamp>,<id>' from the last activity of a page"""
+    return f"{activity.timestamp.isoformat()},{activity.id}"
+
+def decode_cursor(cursor):
+    """Parse a '<timestamp>,<id>' cursor, raising 400 on malformed input"""
+    try:
+        timestamp, activity_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(activity_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/{user_id}", response_model=List[schemas.ActivityResponse])
-def get_activities(user_id: int, limit: int = 50, db: Session = Depends(get_db)):
+async def get_activities(
+    user_id: int,
+    response: Response,
+    limit: int = 50,
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get user's recent activities
+    Get user's recent activities, newest first
     
     - **user_id**: User ID
     - **limit**: Maximum number of activities to return (default 50)
+    - **before**: Cursor from a previous page's `X-Next-Cursor` header
+      (`<timestamp>,<id>`); returns the activities that come after it
     """
-    activities = db.query(models.Activity).filter(
-        models.Activity.user_id == user_id
-    ).order_by(models.Activity.timestamp.desc()).limit(limit).all()
+    query = select(models.Activity).where(models.Activity.user_id == user_id)
+    
+    # Keyset paging: seek past the cursor on the (user_id, timestamp, id) index
+    if before:
+        before_timestamp, before_id = decode_cursor(before)
+        query = query.where(or_(
+            models.Activity.timestamp < before_timestamp,
+            and_(
+                models.Activity.timestamp == before_timestamp,
+                models.Activity.id < before_id
+            )
+        ))
+    
+    activities = (await db.scalars(query.order_by(
+        models.Activity.timestamp.desc(),
+        models.Activity.id.desc()
+    ).limit(limit))).all()
+    
+    # A full page means there may be more history to fetch
+    if activities and len(activities) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(activities[-1])
     
-    return activities
\ No newline at end of file
+    return activities
@@ -0,0 +1,50 @@
+"""
+Burnout alert streaming endpoints
+"""
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from app.services.alert_stream import alert_hub, format_sse
+
+router = APIRouter()
+
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+@router.get("/{user_id}/stream")
+async def stream_alerts(user_id: int, request: Request):
+    """
+    Stream new burnout alerts as Server-Sent Events
+    
+    - **user_id**: ID of the user
+    
+    Each alert (overwork, no_breaks, late_work, low_productivity) is sent
+    once per day, as soon as a logged activity pushes that day past the
+    rule's threshold; no_breaks and low_productivity are judged once the
+    day is over, with the user's next activity.
+    
+    Subscribers are held in this process, so only alerts raised by the
+    same worker reach the stream (run a single worker).
+    """
+    queue = alert_hub.subscribe(user_id)
+    
+    async def events():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            alert_hub.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,8 +2,8 @@
 ML Predictions endpoints - integrates with Harsh's models
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import models
 import sys
 import os
@@ -14,7 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml'))
 router = APIRouter()
 
 @router.get("/{user_id}")
-def get_predictions(user_id: int, db: Session = Depends(get_db)):
+async def get_predictions(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get 24-hour productivity predictions for user
     Uses Harsh's ProductivityPredictor model
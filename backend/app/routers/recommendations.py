@@ -2,24 +2,27 @@
 AI Recommendations endpoint
 """
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import models
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
 @router.get("/{user_id}")
-def get_recommendations(user_id: int, db: Session = Depends(get_db)):
+async def get_recommendations(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get personalized AI recommendations for user
     Combines predictions, patterns, and anomaly detection
     """
     try:
         # Get user's recent activities
-        recent_activities = db.query(models.Activity).filter(
-            models.Activity.user_id == user_id
-        ).order_by(models.Activity.timestamp.desc()).limit(10).all()
+        recent_activities = (await db.scalars(
+            select(models.Activity).where(
+                models.Activity.user_id == user_id
+            ).order_by(models.Activity.timestamp.desc()).limit(10)
+        )).all()
         
         recommendations = []
         
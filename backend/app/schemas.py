@@ -1,10 +1,16 @@
 """
 Pydantic Schemas for Request/Response validation
 """
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, field_validator
+from datetime import datetime, timezone
 from typing import Optional, List
 
+def naive_utc(value):
+    """Convert a timezone-aware datetime to naive UTC (how activity timestamps are stored)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 # User Schemas
 class UserCreate(BaseModel):
     """Schema for creating a new user"""
@@ -30,6 +36,13 @@ class ActivityCreate(BaseModel):
     productivity_score: int  # 1-10
     focus_level: str  # low, medium, high
     notes: Optional[str] = None
+    timestamp: Optional[datetime] = None  # defaults to now; set when syncing past activity
+    
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_to_utc(cls, value):
+        """Offsets like +02:00 are converted, so stored timestamps are all naive UTC"""
+        return naive_utc(value)
 
 class ActivityResponse(BaseModel):
     """Schema for activity response"""
@@ -44,6 +57,18 @@ class ActivityResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ActivityBulkRowStatus(BaseModel):
+    """Outcome of one record in a bulk upload"""
+    index: int
+    status: str  # created, error
+    detail: Optional[str] = None
+
+class ActivityBulkResponse(BaseModel):
+    """Schema for bulk activity upload response"""
+    created: int
+    failed: int
+    results: List[ActivityBulkRowStatus]
+
 # Dashboard Schema
 class DashboardResponse(BaseModel):
     """Schema for complete dashboard data"""
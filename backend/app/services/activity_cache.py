@@ -0,0 +1,257 @@
+"""
+Activity Frame Cache - keeps each user's activity history in memory
+Loaded from the activities table once, then appended to as new rows are logged
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from app import models
+from app.database import SessionLocal
+from app.services.activity_store import activity_store, drop_stored_user
+
+# Column layout shared with ml/data/demo_activities.csv
+ACTIVITY_COLUMNS = [
+    'user_id',
+    'timestamp',
+    'activity_type',
+    'duration',
+    'productivity_score',
+    'focus_level',
+    'notes',
+]
+
+# backend/app/services -> backend/app -> backend -> Rehabit -> ml/data
+_project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+DEMO_DATA_PATH = os.path.join(_project_dir, 'ml', 'data', 'demo_activities.csv')
+
+
+def frame_nbytes(frame):
+    """Approximate in-memory size of a DataFrame, including object columns"""
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class ActivityFrameCache:
+    """
+    LRU cache of per-user activity DataFrames
+
+    Bounded both by number of users and by total bytes held. Users without
+    any logged activity are served the demo history (parsed once, never
+    counted against the budget) so a fresh install still shows insights.
+
+    With a columnar ActivityStore, misses are read from its memory-mapped
+    files instead of SQL; users not in the store yet are copied over from
+    the database on their first miss.
+
+    A miss reads outside the lock, so rows committed meanwhile would be
+    missing from what it read. While a user has loads in flight, append()
+    and invalidate() bump their generation, and a load that finishes on
+    an older generation is served but not cached.
+    """
+
+    def __init__(self, max_users=256, max_bytes=64 * 1024 * 1024,
+                 session_factory=SessionLocal, demo_path=DEMO_DATA_PATH, store=None):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.session_factory = session_factory
+        self.demo_path = demo_path
+        self.store = store
+
+        self._frames = OrderedDict()  # user_id -> DataFrame
+        self._sizes = {}              # user_id -> bytes
+        self._loads = {}              # user_id -> [loads in flight, generation]
+        self._total_bytes = 0
+        self._demo_frame = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, user_id):
+        return user_id in self._frames
+
+    def get(self, user_id):
+        """
+        Get a user's activity history, loading it from the database on a miss
+
+        Returns a shallow copy: callers may add or replace columns without
+        touching the cached frame, but must not write into existing values.
+        """
+        with self._lock:
+            frame = self._frames.get(user_id)
+            if frame is not None:
+                self._frames.move_to_end(user_id)
+                self.hits += 1
+                return frame.copy(deep=False)
+            self.misses += 1
+            loads = self._loads.setdefault(user_id, [0, 0])
+            loads[0] += 1
+            generation = loads[1]
+
+        frame = None
+        copied = False
+        try:
+            frame, from_db = self._load(user_id)
+            if from_db and self.store is not None:
+                # First read of this user: copy their history into the store
+                self.store.write_user(user_id, frame)
+                copied = True
+        finally:
+            with self._lock:
+                loads = self._loads[user_id]
+                current = loads[1] == generation
+                loads[0] -= 1
+                if not loads[0]:
+                    del self._loads[user_id]
+                if current and frame is not None:
+                    self._store(user_id, frame)
+
+        if copied and not current:
+            # Rows committed during the read were skipped by the store (it
+            # had no partition for the user yet), so the copy lacks them
+            drop_stored_user(self.store, user_id)
+
+        if frame is None:
+            return self._get_demo_frame().copy(deep=False)
+        return frame.copy(deep=False)
+
+    def append(self, user_id, records):
+        """
+        Append newly logged activities to a cached user's frame
+
+        Users that are not cached are left alone; their next get() will
+        read the rows from the database.
+        """
+        with self._lock:
+            self._bump(user_id)
+            frame = self._frames.get(user_id)
+            if frame is None:
+                return
+
+            new_rows = pd.DataFrame.from_records(records, columns=ACTIVITY_COLUMNS)
+            # Naive UTC like the stored history (offset-carrying rows are converted)
+            new_rows['timestamp'] = pd.to_datetime(new_rows['timestamp'], utc=True).dt.tz_localize(None)
+            in_order = frame.empty or new_rows['timestamp'].min() >= frame['timestamp'].max()
+            frame = pd.concat([frame, new_rows], ignore_index=True)
+            if not in_order:
+                # Backfilled rows (e.g. bulk sync) - keep history chronological
+                frame = frame.sort_values('timestamp', kind='stable', ignore_index=True)
+            self._store(user_id, frame)
+
+    def invalidate(self, user_id):
+        """Drop a user's cached frame"""
+        with self._lock:
+            self._bump(user_id)
+            self._remove(user_id)
+
+    def clear(self):
+        """Drop every cached frame"""
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Hit/miss/eviction counters and memory use"""
+        with self._lock:
+            return {
+                'entries': len(self._frames),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _load(self, user_id):
+        """
+        Read a user's full history from the store or the activities table
+
+        Returns:
+            (frame or None if empty, whether it was read from the database)
+        """
+        if self.store is not None:
+            frame = self.store.read_user(user_id, ACTIVITY_COLUMNS)
+            if frame is not None:
+                return frame, False
+
+        frame = self._load_from_db(user_id)
+        return frame, frame is not None
+
+    def _load_from_db(self, user_id):
+        """Read a user's full history from the activities table (None if empty)"""
+        columns = [getattr(models.Activity, name) for name in ACTIVITY_COLUMNS]
+
+        db = self.session_factory()
+        try:
+            rows = db.query(*columns).filter(
+                models.Activity.user_id == user_id
+            ).order_by(models.Activity.timestamp).all()
+        finally:
+            db.close()
+
+        if not rows:
+            return None
+
+        frame = pd.DataFrame.from_records(rows, columns=ACTIVITY_COLUMNS)
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+        return frame
+
+    def _get_demo_frame(self):
+        """Demo history for users with no logged activity (parsed once)"""
+        if self._demo_frame is None:
+            if os.path.exists(self.demo_path):
+                frame = pd.read_csv(self.demo_path, parse_dates=['timestamp'])
+            else:
+                print("⚠️  Warning: Demo data not found")
+                frame = pd.DataFrame(columns=ACTIVITY_COLUMNS)
+            self._demo_frame = frame
+        return self._demo_frame
+
+    def _store(self, user_id, frame):
+        """Insert or replace an entry and evict until within budget (lock held)"""
+        self._remove(user_id)
+
+        nbytes = frame_nbytes(frame)
+        if nbytes > self.max_bytes:
+            # Larger than the whole budget - serve it but don't keep it
+            return
+
+        self._frames[user_id] = frame
+        self._sizes[user_id] = nbytes
+        self._total_bytes += nbytes
+
+        while self._frames and (
+            len(self._frames) > self.max_users or self._total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._frames))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _bump(self, user_id):
+        """Mark loads in flight for a user as stale (lock held)"""
+        loads = self._loads.get(user_id)
+        if loads is not None:
+            loads[1] += 1
+
+    def _remove(self, user_id):
+        """Remove an entry and release its bytes (lock held)"""
+        if self._frames.pop(user_id, None) is not None:
+            self._total_bytes -= self._sizes.pop(user_id)
+
+
+# Shared instance used by the ML service and the activity routes
+activity_cache = ActivityFrameCache(
+    max_users=int(os.getenv("ACTIVITY_CACHE_MAX_USERS", "256")),
+    max_bytes=int(os.getenv("ACTIVITY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    store=activity_store,
+)
@@ -0,0 +1,39 @@
+"""
+Activity Events - in-process notifications for newly committed activities
+Lets services react to new data without the routers importing them
+"""
+import threading
+
+_listeners = []
+_lock = threading.Lock()
+
+
+def subscribe(listener):
+    """
+    Register a callback for new activities
+
+    Args:
+        listener: Callable taking (user_id, records)
+    """
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def unsubscribe(listener):
+    """Stop notifying a callback"""
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def publish(user_id, records):
+    """Notify every listener; a failing listener never fails the request"""
+    with _lock:
+        listeners = list(_listeners)
+
+    for listener in listeners:
+        try:
+            listener(user_id, records)
+        except Exception as e:
+            print(f"⚠️  Activity listener {getattr(listener, '__name__', listener)} failed: {e}")
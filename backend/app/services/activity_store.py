@@ -0,0 +1,88 @@
+"""
+Activity Store - columnar per-user copy of the activities table
+Memory-mapped Arrow files the activity cache reads history from instead of
+SQL (see ml/models/activity_store.py); enabled by ACTIVITY_STORE_DIR
+"""
+import os
+
+import pandas as pd
+from sqlalchemy import select
+
+from app import models
+from app.services.ml_path import ml_path  # noqa: F401 - puts ml/ on sys.path
+
+# Store directory; unset keeps reading history from the database
+STORE_DIR = os.getenv("ACTIVITY_STORE_DIR", "")
+
+
+def open_store(path=STORE_DIR):
+    """The ActivityStore at path, or None when disabled (pyarrow is only needed when enabled)"""
+    if not path:
+        return None
+    from models.activity_store import ActivityStore
+    return ActivityStore(path)
+
+
+def append_activities(store, user_id, records, columns):
+    """
+    Mirror newly committed activities into a user's stored history
+
+    Users without a partition yet are skipped: their first cache miss
+    copies their full history over from the database (and drops the copy
+    again if an activity was committed while it was being read).
+    """
+    if store is None or not store.has_user(user_id):
+        return
+    store.append(user_id, pd.DataFrame.from_records(records, columns=columns))
+
+
+def drop_stored_user(store, user_id):
+    """Forget a user's stored history so their next cache miss copies it from the database again"""
+    if store is None:
+        return
+    try:
+        store.drop_user(user_id)
+    except OSError as e:
+        print(f"⚠️  Could not drop stored history for user {user_id}: {e}")
+
+
+def rebuild_store(db, store, user_id=None):
+    """
+    Rewrite stored histories from the activities table
+
+    Args:
+        db: Sync database session
+        store: ActivityStore to write
+        user_id: Only rebuild this user (default: everyone)
+    """
+    from models.activity_store import COLUMNS
+
+    activity_filter = [] if user_id is None else [models.Activity.user_id == user_id]
+    rows = db.execute(
+        select(*[getattr(models.Activity, name) for name in COLUMNS])
+        .where(*activity_filter)
+        .order_by(models.Activity.user_id, models.Activity.timestamp)
+    ).all()
+    activities = pd.DataFrame.from_records(rows, columns=COLUMNS)
+
+    store.import_frame(activities)
+    print(f"✅ Rebuilt activity store for {activities['user_id'].nunique()} users")
+
+
+# Shared instance (None unless ACTIVITY_STORE_DIR is set)
+activity_store = open_store()
+
+
+if __name__ == "__main__":
+    # Copy every user's history into the store: python -m app.services.activity_store
+    from app.database import SessionLocal, init_db
+
+    if activity_store is None:
+        raise SystemExit("❌ Set ACTIVITY_STORE_DIR to the store directory first")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild_store(db, activity_store)
+    finally:
+        db.close()
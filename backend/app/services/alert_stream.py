@@ -0,0 +1,197 @@
+"""
+Alert Stream - burnout rules evaluated as activities arrive, pushed to subscribers
+Uses the activity_daily rollup as running per-day counters and the
+alerts_raised table to send each alert once
+"""
+import asyncio
+import itertools
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, tuple_
+
+from app import models
+from app.services.ml_path import ml_path  # noqa: F401 - puts ml/ on sys.path
+from app.services.rollups import DAILY_SUMS, UPSERT_INSERTS
+from models.burnout_rules import day_metrics, rule_alerts
+
+# Alerts that judge a whole day ("no breaks", "low productivity") are only
+# evaluated once the day is over (UTC), when the user's next activity
+# arrives, and only for days with at least this much work
+STREAM_MIN_WORK_HOURS = float(os.getenv("ALERT_STREAM_MIN_WORK_HOURS", "4"))
+WHOLE_DAY_ALERTS = {'no_breaks', 'low_productivity'}
+
+
+class AlertHub:
+    """
+    Fan-out of alerts to per-user asyncio queues (one per SSE connection)
+
+    Queues are bounded; a subscriber that stops reading loses its oldest
+    alerts rather than growing memory without limit.
+
+    Queues live in this process: with several workers, a stream only
+    receives alerts raised by activities its own worker handled, so run
+    the API with a single worker while streams are in use.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}  # user_id -> set of queues
+        self._ids = itertools.count(1)
+
+    def subscribe(self, user_id):
+        """Register a new subscriber queue for a user's alerts"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id=None):
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id, alert):
+        """Deliver an alert to every subscriber of a user (call from the event loop)"""
+        event = dict(alert, id=next(self._ids))
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+class BurnoutMonitor:
+    """
+    Decides which alerts a user-day's counters newly raise
+
+    Alerts are raised once per type per day, when a day's counters first
+    cross a rule's threshold. What was raised is recorded in the
+    alerts_raised table, so workers and restarts agree; the types known
+    to be raised for the most recent user-days are also kept here to skip
+    the table.
+    """
+
+    def __init__(self, max_days=10000):
+        self.max_days = max_days
+        self._raised = OrderedDict()  # (user_id, date) -> set of alert types
+
+    def candidates(self, user_id, day, counters, today):
+        """
+        Evaluate the rules for one day's counters
+
+        Args:
+            user_id: User the counters belong to
+            day: The date the counters cover
+            counters: activity_daily sums for that day
+            today: Current UTC date; whole-day alerts wait until day < today
+
+        Returns:
+            List of alerts not known to be raised for this user and day
+        """
+        metrics = day_metrics(counters)
+        alerts = rule_alerts(metrics)
+        if day >= today or metrics['total_work_hours'] < STREAM_MIN_WORK_HOURS:
+            alerts = [alert for alert in alerts if alert['type'] not in WHOLE_DAY_ALERTS]
+
+        raised = self._raised.get((user_id, day), ())
+        return [
+            dict(alert, user_id=user_id, date=day.isoformat(), raised_at=datetime.utcnow().isoformat())
+            for alert in alerts if alert['type'] not in raised
+        ]
+
+    def mark(self, user_id, day, alert_type):
+        """Remember that an alert type was raised for a user-day"""
+        key = (user_id, day)
+        self._raised.setdefault(key, set()).add(alert_type)
+        self._raised.move_to_end(key)
+        while len(self._raised) > self.max_days:
+            self._raised.popitem(last=False)
+
+
+async def claim_alert(db, user_id, day, alert_type):
+    """
+    Record an alert in alerts_raised
+
+    Returns:
+        True if this call recorded it, False if it was already raised
+    """
+    table = models.AlertRaised.__table__
+    row = {'user_id': user_id, 'bucket': day, 'alert_type': alert_type, 'raised_at': datetime.utcnow()}
+    make_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+
+    if make_insert is not None:
+        result = await db.execute(make_insert(table).values(**row).on_conflict_do_nothing())
+        return result.rowcount == 1
+
+    # Portable fallback: check first (two workers may both send it)
+    if await db.get(models.AlertRaised, (user_id, day, alert_type)) is not None:
+        return False
+    await db.execute(insert(table).values(**row))
+    return True
+
+
+async def check_burnout(db, records):
+    """
+    Evaluate the burnout rules for the days touched by newly committed activities
+
+    Also evaluates each user's most recent finished day, which is when its
+    whole-day alerts are decided. Reads the committed activity_daily rows
+    in one query, records newly crossed alerts in alerts_raised (committed
+    here) and publishes them to the user's subscribers.
+    """
+    keys = {(record['user_id'], record['timestamp'].date()) for record in records}
+    if not keys:
+        return []
+
+    table = models.ActivityDaily.__table__
+    today = datetime.utcnow().date()
+    try:
+        finished = (await db.execute(
+            select(table.c.user_id, func.max(table.c.bucket))
+            .where(table.c.user_id.in_({user_id for user_id, _ in keys}), table.c.bucket < today)
+            .group_by(table.c.user_id)
+        )).all()
+        keys.update((user_id, day) for user_id, day in finished)
+
+        rows = (await db.execute(
+            select(table.c.user_id, table.c.bucket, *[table.c[c] for c in DAILY_SUMS])
+            .where(tuple_(table.c.user_id, table.c.bucket).in_(list(keys)))
+        )).mappings().all()
+
+        claimed = []
+        raised = []
+        for row in rows:
+            for alert in burnout_monitor.candidates(row['user_id'], row['bucket'], row, today):
+                if await claim_alert(db, row['user_id'], row['bucket'], alert['type']):
+                    raised.append(alert)
+                claimed.append((row['user_id'], row['bucket'], alert['type']))
+        await db.commit()
+    except Exception as e:
+        # The activities are already committed; a missed alert must not fail the request
+        print(f"⚠️  Burnout check failed: {e}")
+        await db.rollback()
+        return []
+
+    for user_id, day, alert_type in claimed:
+        burnout_monitor.mark(user_id, day, alert_type)
+    for alert in raised:
+        alert_hub.publish(alert['user_id'], alert)
+    return raised
+
+
+def format_sse(event):
+    """Encode an alert as a Server-Sent Event"""
+    return f"id: {event['id']}\nevent: alert\ndata: {json.dumps(event)}\n\n"
+
+
+# Shared instances used by the activity routes and the alerts stream
+alert_hub = AlertHub()
+burnout_monitor = BurnoutMonitor()
@@ -0,0 +1,123 @@
+"""
+Dashboard Cache - keeps each user's assembled dashboard payload in memory
+Entries expire after a TTL and are invalidated as soon as the user logs activity
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class DashboardCache:
+    """
+    LRU + TTL cache of dashboard payloads keyed by user
+
+    Every invalidation bumps a per-user version. A payload computed from
+    data read before an invalidation carries the old version and is
+    dropped by put(), so a slow dashboard build can never overwrite the
+    result of a newer activity. A version is only kept while the user has
+    a cached payload or a build in flight; after that no one holds an old
+    version to compare against, so it is forgotten.
+    """
+
+    def __init__(self, max_users=1024, ttl_seconds=300, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._entries = OrderedDict()  # user_id -> (expires_at, payload)
+        self._versions = {}            # user_id -> invalidation count
+        self._building = {}            # user_id -> builds in flight
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @contextmanager
+    def building(self, user_id):
+        """Mark a dashboard build in flight; yields the version to pass to put()"""
+        with self._lock:
+            self._building[user_id] = self._building.get(user_id, 0) + 1
+            version = self._versions.get(user_id, 0)
+        try:
+            yield version
+        finally:
+            with self._lock:
+                self._building[user_id] -= 1
+                if not self._building[user_id]:
+                    del self._building[user_id]
+                self._forget(user_id)
+
+    def get(self, user_id):
+        """Return the cached payload for a user, or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= self.clock():
+                del self._entries[user_id]
+                self._forget(user_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return payload
+
+    def put(self, user_id, payload, version):
+        """Store a payload unless the user was invalidated since `version`"""
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                return False
+
+            self._entries[user_id] = (self.clock() + self.ttl_seconds, payload)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, user_id):
+        """Drop a user's payload and reject any build already in flight"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._forget(user_id)
+
+    def clear(self):
+        """Drop every cached payload"""
+        with self._lock:
+            self._entries.clear()
+            for user_id in list(self._versions):
+                self._forget(user_id)
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _forget(self, user_id):
+        """Drop a user's version once nothing can compare against it (lock held)"""
+        if user_id not in self._entries and user_id not in self._building:
+            self._versions.pop(user_id, None)
+
+
+# Shared instance used by the dashboard endpoint and the activity routes
+dashboard_cache = DashboardCache(
+    max_users=int(os.getenv("DASHBOARD_CACHE_MAX_USERS", "1024")),
+    ttl_seconds=float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "300")),
+)
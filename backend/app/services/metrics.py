@@ -0,0 +1,296 @@
+"""
+Metrics - in-process counters and histograms exposed in Prometheus text format
+Request latency per route, dashboard stage timings, database queries and cache
+counters, served by GET /metrics
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Histogram bucket upper bounds in seconds (Prometheus client defaults plus
+# finer steps below 5 ms, where cached dashboards and queries land)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """
+    Observation counts in fixed buckets, plus their sum, per label set
+
+    observe() is a bisect and three additions under a lock; buckets are
+    only made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Collected:
+    """
+    A metric read from elsewhere at scrape time (e.g. a cache's stats())
+
+    The callback returns (label values tuple, value) pairs; nothing is
+    recorded between scrapes.
+    """
+
+    def __init__(self, name, help, type, labels, collect):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in self.collect()]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name, help, type, labels, collect):
+        return self._register(Collected(name, help, type, labels, collect))
+
+    def render(self):
+        """Every metric as Prometheus text"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.render()
+            except Exception as e:
+                # A failing collector must not take the whole scrape down
+                print(f"⚠️  Metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+# Shared registry and the metrics recorded across the backend
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "rehabit_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    labels=("method", "route", "status"),
+)
+dashboard_stage_duration = metrics.histogram(
+    "rehabit_dashboard_stage_duration_seconds",
+    "Time spent in each stage of building a dashboard",
+    labels=("stage",),
+)
+db_query_duration = metrics.histogram(
+    "rehabit_db_query_duration_seconds",
+    "Database statement execution time by engine and statement type",
+    labels=("engine", "operation"),
+)
+
+
+def dashboard_stage(stage):
+    """Time a dashboard stage: with dashboard_stage('forecast'): ..."""
+    return dashboard_stage_duration.time(stage)
+
+
+def instrument_engine(engine, name):
+    """
+    Time every statement an engine executes
+
+    Args:
+        engine: Sync Engine (pass async_engine.sync_engine for async ones)
+        name: engine label value
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        db_query_duration.observe(elapsed, name, operation)
+
+
+def route_label(scope):
+    """The matched route's path template (/api/dashboard/{user_id}), so labels stay bounded"""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    if route.path_regex.match(scope["path"]):
+        return template
+
+    # Newer FastAPI matches included routers' routes by their path relative
+    # to the prefix; the prefix is whatever precedes them in the request path
+    segments = scope["path"].rstrip("/").split("/")
+    prefix = segments[:len(segments) - template.rstrip("/").count("/")]
+    return "/".join(prefix) + template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration for every request
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streamed responses (the
+    SSE alert stream) are passed through untouched. Duration runs until
+    the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - start, scope["method"], route_label(scope), str(status[0])
+            )
+
+
+def cache_metrics(caches):
+    """
+    Export hit/miss/eviction counters and sizes of caches with a stats() method
+
+    Args:
+        caches: Dict of cache label -> callable returning the cache's
+            stats() dict, or None while it does not exist yet
+    """
+    def collector(key):
+        def collect():
+            for cache, stats in caches.items():
+                values = stats()
+                if values is not None and key in values:
+                    yield (cache,), values[key]
+        return collect
+
+    for key, type, help in [
+        ("hits", "counter", "Cache lookups served from memory"),
+        ("misses", "counter", "Cache lookups that had to load or rebuild"),
+        ("evictions", "counter", "Entries evicted to stay within the cache budget"),
+        ("fallbacks", "counter", "Lookups served the global models (no per-user artifacts)"),
+        ("entries", "gauge", "Entries currently cached"),
+        ("bytes", "gauge", "Approximate bytes held by the cache"),
+    ]:
+        metrics.collected(f"rehabit_cache_{key}" + ("_total" if type == "counter" else ""),
+                          help, type, ("cache",), collector(key))
@@ -0,0 +1,17 @@
+"""
+ML Path - makes the ml/ directory importable (`from models.x import ...`)
+Import this before any ml module
+"""
+import sys
+import os
+
+# Calculate path to ml directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(os.path.dirname(current_dir))
+project_dir = os.path.dirname(backend_dir)
+ml_path = os.path.join(project_dir, 'ml')
+
+# Add ml directory to Python path
+if ml_path not in sys.path:
+    sys.path.insert(0, ml_path)
+    print(f"✅ ML Path: {ml_path}")
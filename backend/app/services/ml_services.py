@@ -1,93 +1,204 @@
 """
 ML Service - Integrates Harsh's ML models
+Models are loaded on a background thread so the API can serve traffic meanwhile
 """
-import sys
 import os
-import pandas as pd
+import threading
+import time
 
-# Calculate path to ml directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-backend_dir = os.path.dirname(os.path.dirname(current_dir))
-project_dir = os.path.dirname(backend_dir)
-ml_path = os.path.join(project_dir, 'ml')
+from app.database import SessionLocal
+from app.services import activity_events
+from app.services.activity_cache import activity_cache
+from app.services.metrics import dashboard_stage
+from app.services.ml_path import ml_path
+from app.services.model_registry import ModelRegistry
+from app.services.rollups import load_daily_rollup
+from app.services.sketches import load_sketch
 
-# Add ml directory to Python path
-sys.path.insert(0, ml_path)
-print(f"✅ ML Path: {ml_path}")
 
-try:
-    # Import ML models
-    from models.productivity_predictor import ProductivityPredictor
-    from models.pattern_recognition import PatternRecognizer
-    from models.anomaly_detection import AnomalyDetector
-    from models.recommendation_engine import RecommendationEngine
+class MLService:
+    """Service to interact with ML models"""
     
-    class MLService:
-        """Service to interact with ML models"""
+    def __init__(self):
+        print("🤖 Initializing ML Service...")
         
-        def __init__(self):
-            print("🤖 Initializing ML Service...")
-            
-            # Initialize models
-            self.predictor = ProductivityPredictor()
-            self.recognizer = PatternRecognizer()
-            self.detector = AnomalyDetector()
-            self.engine = RecommendationEngine()
-            
-            # Load trained models
-            models_dir = os.path.join(ml_path, 'saved_models')
-            
-            try:
-                self.predictor.load_model(os.path.join(models_dir, 'productivity_model.pkl'))
-                self.recognizer.load_model(os.path.join(models_dir, 'pattern_model.pkl'))
-                self.detector.load_model(os.path.join(models_dir, 'anomaly_model.pkl'))
-                print("✅ All ML models loaded successfully")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not load models: {e}")
+        # Importing the models pulls in Prophet and scikit-learn
+        from models.productivity_predictor import ProductivityPredictor
+        from models.pattern_recognition import PatternRecognizer
+        from models.anomaly_detection import AnomalyDetector
+        from models.recommendation_engine import RecommendationEngine
+        from models.features import prepare_features
         
-        def get_dashboard_data(self, user_id: int):
-            """Get complete dashboard data for user"""
-            print(f"🔮 Generating ML insights for user {user_id}...")
-            
-            # Get user data
-            user_data = self._get_user_data(user_id)
-            
-            # Generate predictions
-            predictions = self.predictor.predict(periods=24)
-            
-            # Recognize pattern
-            pattern = self.recognizer.predict_pattern(user_data)
-            
-            # Detect anomalies
-            anomaly = self.detector.detect(user_data)
-            
-            # Generate recommendations
-            recommendations = self.engine.generate_recommendations(
-                user_data, predictions, pattern, anomaly
+        # Initialize models
+        self.prepare_features = prepare_features
+        self.predictor = ProductivityPredictor()
+        self.recognizer = PatternRecognizer()
+        self.detector = AnomalyDetector()
+        self.engine = RecommendationEngine()
+        self.registry = None
+        self.models_loaded = False
+        
+        # Load trained models (global ones now, per-user ones on demand)
+        models_dir = os.path.join(ml_path, 'saved_models')
+        
+        try:
+            self.registry = ModelRegistry(
+                models_dir,
+                {
+                    'predictor': ProductivityPredictor,
+                    'recognizer': PatternRecognizer,
+                    'detector': AnomalyDetector,
+                },
+                max_bytes=int(os.getenv("MODEL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
             )
-            
-            return {
-                'predictions': predictions.to_dict('records'),
-                'pattern': pattern,
-                'anomaly': anomaly,
-                'recommendations': recommendations
-            }
+            self.predictor = self.registry.global_models.predictor
+            self.recognizer = self.registry.global_models.recognizer
+            self.detector = self.registry.global_models.detector
+            self.models_loaded = True
+            print("✅ All ML models loaded successfully")
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load models: {e}")
+    
+    def get_dashboard_data(self, user_id: int):
+        """Get complete dashboard data for user"""
+        print(f"🔮 Generating ML insights for user {user_id}...")
         
-        def _get_user_data(self, user_id: int):
-            """Get user's activity data"""
-            demo_data_path = os.path.join(ml_path, 'data', 'demo_activities.csv')
-            if os.path.exists(demo_data_path):
-                df = pd.read_csv(demo_data_path)
-                return df
+        # Get user data (parsed once, shared read-only by every model) and
+        # the models trained for this user
+        with dashboard_stage('load_data'):
+            user_data = self.prepare_features(self._get_user_data(user_id))
+        with dashboard_stage('load_models'):
+            models = self.registry.get(user_id)
+        
+        # Generate predictions
+        with dashboard_stage('forecast'):
+            predictions = models.predictor.predict(periods=24)
+        
+        # Recognize pattern (from the hourly sketch when the user has one)
+        with dashboard_stage('pattern'):
+            sketch = self._get_sketch(user_id)
+            if sketch is not None:
+                pattern = models.recognizer.predict_pattern(sketch=sketch)
             else:
-                print("⚠️  Warning: Demo data not found")
-                return pd.DataFrame()
+                pattern = models.recognizer.predict_pattern(user_data)
+        
+        # Detect anomalies (from the daily rollup when the user has one)
+        with dashboard_stage('anomaly'):
+            daily_df = self._get_daily_features(user_id, models.detector)
+            anomaly = models.detector.detect(user_data, daily_df=daily_df)
+        
+        # Generate recommendations (today's totals come from the rollup too)
+        with dashboard_stage('recommendations'):
+            today = daily_df.iloc[-1] if daily_df is not None else None
+            recommendations = self.engine.generate_recommendations(
+                user_data, predictions, pattern, anomaly, today=today
+            )
+        
+        return {
+            'predictions': predictions.to_dict('records'),
+            'pattern': pattern,
+            'anomaly': anomaly,
+            'recommendations': recommendations
+        }
+    
+    def observe_activities(self, user_id: int, records):
+        """
+        Feed new activities to the user's online forecaster
+        
+        Only personal models learn online (the global model is shared by
+        every user and stays as trained). The forecaster folds in hourly
+        means like training does, and the updated state is written back to
+        the user's artifact, so it survives eviction and restarts until the
+        next training run replaces it.
+        """
+        if self.registry is None:
+            return
+        models = self.registry.get(user_id)
+        if models.predictor is self.registry.global_models.predictor:
+            return
+        
+        changed = False
+        for record in sorted(records, key=lambda r: r['timestamp']):
+            if record.get('productivity_score') is None:
+                continue
+            changed |= models.predictor.update(record['timestamp'], record['productivity_score'])
+        if changed:
+            self.registry.save(models, 'predictor')
+    
+    def _get_user_data(self, user_id: int):
+        """Get user's activity data (served from the in-memory frame cache)"""
+        return activity_cache.get(user_id)
     
-    # Create singleton instance
-    ml_service = MLService()
+    def _get_sketch(self, user_id: int):
+        """Get user's hourly productivity sketch"""
+        db = SessionLocal()
+        try:
+            return load_sketch(db, user_id)
+        finally:
+            db.close()
     
-except Exception as e:
-    print(f"⚠️  Warning: ML Service initialization failed: {e}")
-    print(f"   ML models will not be available")
-    ml_service = None
+    def _get_daily_features(self, user_id: int, detector):
+        """Get user's daily anomaly features from the activity_daily rollup"""
+        db = SessionLocal()
+        try:
+            daily_rollup = load_daily_rollup(db, user_id)
+        finally:
+            db.close()
+        
+        if daily_rollup.empty:
+            return None
+        return detector.prepare_rollup_features(daily_rollup)
+
+
+# Loaded in the background by start_loading(); None until the models are ready
+ml_service = None
+ml_status = 'not_started'  # not_started -> loading -> ready | failed
+ml_error = None
+ml_load_seconds = None
+
+_ready = threading.Event()
+_start_lock = threading.Lock()
+
+
+def start_loading():
+    """Start loading the ML models on a daemon thread (only the first call does anything)"""
+    global ml_status
+    
+    with _start_lock:
+        if ml_status != 'not_started':
+            return
+        ml_status = 'loading'
+    
+    threading.Thread(target=_load, name="ml-loader", daemon=True).start()
+
+
+def wait_until_ready(timeout=None):
+    """Block until loading has finished (successfully or not); returns True when ready"""
+    _ready.wait(timeout)
+    return ml_status == 'ready'
+
 
+def _load():
+    """Build the MLService and publish it once its models are loaded"""
+    global ml_service, ml_status, ml_error, ml_load_seconds
+    
+    start = time.perf_counter()
+    try:
+        service = MLService()
+        if not service.models_loaded:
+            raise RuntimeError("ML models not loaded")
+        
+        # Keep online forecasters current as activities are logged
+        activity_events.subscribe(service.observe_activities)
+        
+        ml_service = service
+        ml_status = 'ready'
+        print("🚀 ML models ready")
+    except Exception as e:
+        ml_error = str(e)
+        ml_status = 'failed'
+        print(f"⚠️  Warning: ML Service initialization failed: {e}")
+        print(f"   ML models will not be available")
+    finally:
+        ml_load_seconds = time.perf_counter() - start
+        _ready.set()
@@ -0,0 +1,350 @@
+"""
+Model Registry - per-user ML models, loaded lazily and kept in a bounded LRU
+Users without their own artifacts are served the global models
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Artifact file for each model in a models directory
+MODEL_FILES = {
+    'predictor': 'productivity_model.pkl',
+    'recognizer': 'pattern_model.pkl',
+    'detector': 'anomaly_model.pkl',
+}
+
+# Written by ml/scripts/train_models.py after every run; a change means
+# artifacts were rewritten
+MANIFEST_FILE = 'manifest.json'
+GLOBAL_KEY = 'global'
+MANIFEST_CHECK_SECONDS = 5.0
+
+# Users known to have no artifacts of their own are remembered (up to this
+# many) so their lookups skip the disk
+MAX_FALLBACK_USERS = 100_000
+
+
+def file_stamp(path):
+    """(mtime, size) of a file, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def estimate_nbytes(obj):
+    """
+    Approximate memory held by a loaded model
+
+    Walks the object graph once: numpy arrays count their buffers, pandas
+    objects their deep memory usage, containers and plain objects their
+    own size plus what they reference. Classes, modules and functions are
+    shared, so they are not counted.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, types.ModuleType, types.FunctionType,
+                                                 types.BuiltinFunctionType, types.MethodType)):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            # Views don't own their data; their base is counted instead
+            total += sys.getsizeof(item)
+            if item.base is not None:
+                stack.append(item.base)
+        elif isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            total += int(np.sum(item.memory_usage(deep=True)))
+        elif isinstance(item, dict):
+            total += sys.getsizeof(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(item)
+            stack.extend(item)
+        else:
+            total += sys.getsizeof(item)
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+
+    return total
+
+
+class ModelBundle:
+    """The trained models that serve one user"""
+
+    def __init__(self, predictor, recognizer, detector, user_id=None, nbytes=0):
+        self.predictor = predictor
+        self.recognizer = recognizer
+        self.detector = detector
+        self.user_id = user_id  # None for the global models
+        self.nbytes = nbytes
+        self.stamps = {}  # model name -> file_stamp() of the artifact it was loaded from
+
+
+class ModelRegistry:
+    """
+    Per-user model bundles loaded from <models_dir>/<user_id>/
+
+    Each model falls back to the global one independently, so a user with
+    only a personal forecast still gets the shared pattern and anomaly
+    models. Loaded bundles are kept in an LRU bounded by the estimated
+    memory of their models; the global bundle is always resident.
+
+    Every MANIFEST_CHECK_SECONDS a lookup checks the training manifest:
+    when it has changed, users whose entries changed are dropped (and the
+    global models reloaded if they were retrained), so new artifacts are
+    picked up without a restart. Artifacts written some other way need an
+    explicit invalidate().
+    """
+
+    def __init__(self, models_dir, model_classes, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            models_dir: Directory with the global artifacts and per-user subdirectories
+            model_classes: Dict of bundle attribute -> model class (see MODEL_FILES)
+            max_bytes: Budget for cached per-user models (estimated memory)
+        """
+        self.models_dir = models_dir
+        self.model_classes = model_classes
+        self.max_bytes = max_bytes
+
+        self._bundles = OrderedDict()  # user_id -> ModelBundle
+        self._fallback_users = OrderedDict()  # user_id -> None, users without artifacts
+        self._total_bytes = 0
+        self._generation = 0  # bumped by invalidations; loads started before one are not cached
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+        self._manifest_mtime = self._manifest_stamp()
+        self._manifest_entries = self._read_manifest()
+        self._next_manifest_check = time.monotonic() + MANIFEST_CHECK_SECONDS
+
+        self.global_models = self._load(models_dir)
+
+    def get(self, user_id):
+        """Get the models for a user, loading their artifacts on first use"""
+        self._check_manifest()
+
+        with self._lock:
+            bundle = self._bundles.get(user_id)
+            if bundle is not None:
+                self._bundles.move_to_end(user_id)
+                self.hits += 1
+                return bundle
+            if user_id in self._fallback_users:
+                self._fallback_users.move_to_end(user_id)
+                self.hits += 1
+                self.fallbacks += 1
+                return self.global_models
+            self.misses += 1
+            generation = self._generation
+            global_models = self.global_models
+
+        user_dir = os.path.join(self.models_dir, str(user_id))
+        bundle = None
+        if os.path.isdir(user_dir):
+            bundle = self._load(user_dir, fallback=global_models, user_id=user_id)
+
+        with self._lock:
+            if bundle is None or bundle.nbytes == 0:
+                # No directory, or one that holds none of our artifacts
+                self.fallbacks += 1
+                if generation == self._generation:
+                    self._remember_fallback(user_id)
+                return global_models
+            if generation == self._generation:
+                self._store(user_id, bundle)
+        return bundle
+
+    def save(self, bundle, name):
+        """
+        Write a user's model back to their artifact after online updates
+
+        Skipped, and the bundle dropped, if the artifact changed since it
+        was loaded (e.g. a training run replaced it), so fresh training is
+        never overwritten with older state.
+
+        Args:
+            bundle: The user's ModelBundle (from get())
+            name: Bundle attribute of the model to save (see MODEL_FILES)
+
+        Returns:
+            True if the model was written
+        """
+        path = os.path.join(self.models_dir, str(bundle.user_id), MODEL_FILES[name])
+        with self._save_lock:
+            if bundle.user_id is None or file_stamp(path) != bundle.stamps.get(name):
+                self.invalidate(bundle.user_id)
+                return False
+            getattr(bundle, name).save_model(path)
+            bundle.stamps[name] = file_stamp(path)
+        return True
+
+    def peek(self, user_id):
+        """A user's bundle if it is already loaded, without touching LRU order"""
+        with self._lock:
+            return self._bundles.get(user_id)
+    
+    def invalidate(self, user_id):
+        """Drop a user's bundle so retrained artifacts are picked up"""
+        with self._lock:
+            self._drop(user_id)
+            self._generation += 1
+
+    def refresh(self):
+        """
+        Re-read the manifest and drop whatever it says was retrained
+
+        Users whose entries were added, changed or removed are dropped; if
+        the global entry changed the global models are reloaded and every
+        cached bundle (which may fall back to the old ones) is dropped.
+        """
+        entries = self._read_manifest()
+        changed = {
+            key for key in entries.keys() | self._manifest_entries.keys()
+            if entries.get(key) != self._manifest_entries.get(key)
+        }
+        self._manifest_entries = entries
+        if not changed:
+            return
+
+        if GLOBAL_KEY in changed:
+            try:
+                global_models = self._load(self.models_dir)
+            except Exception as e:
+                print(f"⚠️  Could not reload global models: {e}")
+            else:
+                with self._lock:
+                    self.global_models = global_models
+                    self._bundles.clear()
+                    self._fallback_users.clear()
+                    self._total_bytes = 0
+                    self._generation += 1
+                print("🔄 Global models reloaded")
+                return
+
+        with self._lock:
+            for user_id in [user_id for user_id in list(self._bundles) + list(self._fallback_users)
+                            if str(user_id) in changed]:
+                self._drop(user_id)
+            self._generation += 1
+        print(f"🔄 Model manifest changed, {len(changed - {GLOBAL_KEY})} user(s) retrained")
+
+    def stats(self):
+        """Hit/miss/eviction counters and memory use"""
+        with self._lock:
+            return {
+                'users': len(self._bundles),
+                'fallback_users': len(self._fallback_users),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'fallbacks': self.fallbacks,
+            }
+
+    def _load(self, directory, fallback=None, user_id=None):
+        """Load whichever artifacts exist in a directory"""
+        models = {}
+        loaded = []
+        stamps = {}
+
+        for name, filename in MODEL_FILES.items():
+            path = os.path.join(directory, filename)
+            if fallback is not None and not os.path.exists(path):
+                models[name] = getattr(fallback, name)
+                continue
+
+            stamps[name] = file_stamp(path)
+            model = self.model_classes[name]()
+            model.load_model(path)
+            models[name] = model
+            loaded.append(model)
+
+        # Only this user's own models count against the budget, not the shared fallbacks
+        nbytes = estimate_nbytes(loaded) if loaded else 0
+        bundle = ModelBundle(user_id=user_id, nbytes=nbytes, **models)
+        bundle.stamps = stamps
+        return bundle
+
+    def _check_manifest(self):
+        """Refresh when the manifest changed (looked at once per MANIFEST_CHECK_SECONDS)"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_manifest_check:
+                return
+            self._next_manifest_check = now + MANIFEST_CHECK_SECONDS
+
+        stamp = self._manifest_stamp()
+        with self._lock:
+            if stamp == self._manifest_mtime:
+                return
+            self._manifest_mtime = stamp
+        self.refresh()
+
+    def _manifest_stamp(self):
+        return file_stamp(os.path.join(self.models_dir, MANIFEST_FILE))
+
+    def _read_manifest(self):
+        """Manifest entries: str(user_id) -> entry, plus GLOBAL_KEY"""
+        try:
+            with open(os.path.join(self.models_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        entries = dict(manifest.get('users', {}))
+        if GLOBAL_KEY in manifest:
+            entries[GLOBAL_KEY] = manifest[GLOBAL_KEY]
+        return entries
+
+    def _drop(self, user_id):
+        """Forget a user's bundle or fallback decision (lock held)"""
+        self._fallback_users.pop(user_id, None)
+        bundle = self._bundles.pop(user_id, None)
+        if bundle is not None:
+            self._total_bytes -= bundle.nbytes
+
+    def _remember_fallback(self, user_id):
+        """Record that a user has no artifacts of their own (lock held)"""
+        self._fallback_users[user_id] = None
+        if len(self._fallback_users) > MAX_FALLBACK_USERS:
+            self._fallback_users.popitem(last=False)
+
+    def _store(self, user_id, bundle):
+        """Cache a bundle and evict least recently used ones (lock held)"""
+        previous = self._bundles.pop(user_id, None)
+        if previous is not None:
+            self._total_bytes -= previous.nbytes
+
+        if bundle.nbytes > self.max_bytes:
+            # Too big to keep - serve it this once
+            return
+
+        self._bundles[user_id] = bundle
+        self._total_bytes += bundle.nbytes
+
+        while self._total_bytes > self.max_bytes:
+            _, evicted = self._bundles.popitem(last=False)
+            self._total_bytes -= evicted.nbytes
+            self.evictions += 1
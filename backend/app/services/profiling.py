@@ -0,0 +1,220 @@
+"""
+Dashboard Profiling - opt-in cProfile runs of single dashboard requests
+Enabled by DASHBOARD_PROFILING and requested per call with the X-Rehabit-Profile
+header; the response carries a call-tree summary and the full profile is kept
+in a bounded directory of .prof files
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_HEADER = "x-rehabit-profile"
+
+# Call-tree pruning: deepest level shown, and branches below this share of
+# the profiled time are dropped
+TREE_MAX_DEPTH = 12
+TREE_MIN_FRACTION = 0.01
+TOP_FUNCTIONS = 15
+
+
+def _env_flag(name):
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _describe(func):
+    """(file, line, name) from pstats -> 'name (file:line)', or the builtin's name"""
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def call_tree(stats, max_depth=TREE_MAX_DEPTH, min_fraction=TREE_MIN_FRACTION):
+    """
+    Rebuild the call tree of a profile from pstats' caller edges
+
+    cProfile only records caller -> callee pairs, not full stacks: below
+    the first level a callee's time is its caller's edge scaled by the share
+    of the caller's time spent on this path (as gprof does). Recursion is
+    cut at the first repeat on a path.
+
+    Args:
+        stats: pstats.Stats
+        max_depth: Deepest level to expand
+        min_fraction: Drop callees that took less than this share of the total
+
+    Returns:
+        List of {function, calls, total_ms, self_ms, children} for the roots
+    """
+    entries = stats.stats  # func -> (primitive calls, calls, self s, cumulative s, callers)
+    children = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge))
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    total = sum(entries[func][3] for func in roots) or stats.total_tt or 1e-9
+
+    def node(func, calls, cumulative, own, path, depth):
+        result = {
+            'function': _describe(func),
+            'calls': calls,
+            'total_ms': round(cumulative * 1000, 3),
+            'self_ms': round(own * 1000, 3),
+        }
+        if depth >= max_depth or cumulative < total * min_fraction:
+            return result
+
+        # Share of func's time that was spent on this path
+        scale = min(1.0, cumulative / entries[func][3]) if entries[func][3] else 0.0
+        branch = [
+            # edge: (primitive calls, calls, self s, cumulative s) of callee when called from func
+            (callee, round(edge[1] * scale), edge[3] * scale, edge[2] * scale)
+            for callee, edge in children.get(func, ())
+            if callee not in path and edge[3] * scale >= total * min_fraction
+        ]
+        branch.sort(key=lambda item: item[2], reverse=True)
+        if branch:
+            result['children'] = [
+                node(callee, callee_calls, callee_cumulative, callee_own, path | {callee}, depth + 1)
+                for callee, callee_calls, callee_cumulative, callee_own in branch
+            ]
+        return result
+
+    roots.sort(key=lambda func: entries[func][3], reverse=True)
+    return [
+        node(func, entries[func][1], entries[func][3], entries[func][2], {func}, 0)
+        for func in roots if entries[func][3] >= total * min_fraction
+    ]
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    """The functions with the most self time"""
+    ranked = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': _describe(func),
+            'calls': calls,
+            'self_ms': round(own * 1000, 3),
+            'total_ms': round(cumulative * 1000, 3),
+        }
+        for func, (_, calls, own, cumulative, _) in ranked
+    ]
+
+
+class ProfileRing:
+    """
+    Directory holding the most recent `keep` profiles as pstats files
+
+    Open one with `python -m pstats <file>` or snakeviz. Writes go through
+    a temporary file and a rename, so readers never see a partial profile.
+    """
+
+    def __init__(self, directory, keep=20):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profile, label):
+        """Write a profile and delete the oldest beyond `keep`; returns its path"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{time.time_ns():020d}-{label}.prof")
+            tmp_path = path + ".tmp"
+            profile.dump_stats(tmp_path)
+            os.replace(tmp_path, path)
+
+            for old_path in self.files()[:-self.keep or None]:
+                os.remove(old_path)
+            return path
+
+    def files(self):
+        """Saved profiles, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.endswith(".prof")
+        )
+
+
+class DashboardProfiler:
+    """
+    Profiles individual dashboard requests on demand
+
+    Off unless enabled; when a token is configured the request header must
+    carry it, otherwise any truthy header value ("1") turns profiling on.
+    With require_token (anywhere but development) profiling stays off
+    until a token is configured. cProfile allows one active profiler per
+    interpreter, so a request that arrives while another is being
+    profiled is served unprofiled.
+    """
+
+    def __init__(self, enabled=False, directory="./profiles", keep=20, token="", require_token=False):
+        if enabled and require_token and not token:
+            print("⚠️  Dashboard profiling disabled: set DASHBOARD_PROFILE_TOKEN outside development")
+            enabled = False
+        self.enabled = enabled
+        self.token = token
+        self.ring = ProfileRing(directory, keep)
+        self._busy = threading.Lock()
+
+    def requested(self, headers):
+        """Whether a request with these headers should be profiled"""
+        if not self.enabled:
+            return False
+        value = headers.get(PROFILE_HEADER, "").strip()
+        if self.token:
+            return value == self.token
+        return value.lower() in ("1", "true", "yes", "on")
+
+    @contextmanager
+    def profile(self, label):
+        """
+        Profile a with-block
+
+        Yields a dict that is filled in on exit with the call tree, the
+        functions with the most self time and the saved profile's file name
+        (in the profile directory), or {'skipped': reason} when another
+        profile is running.
+        """
+        report = {}
+        if not self._busy.acquire(blocking=False):
+            report['skipped'] = 'another request is being profiled'
+            yield report
+            return
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                yield report
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - start
+
+            stats = pstats.Stats(profile)
+            report['wall_ms'] = round(elapsed * 1000, 3)
+            report['call_tree'] = call_tree(stats)
+            report['top_functions'] = top_functions(stats)
+            try:
+                # Just the name: the server's directory layout isn't the client's business
+                report['profile_file'] = os.path.basename(self.ring.save(profile, label))
+            except OSError as e:
+                print(f"⚠️  Could not save profile: {e}")
+        finally:
+            self._busy.release()
+
+
+# Shared instance used by the dashboard endpoint
+dashboard_profiler = DashboardProfiler(
+    enabled=_env_flag("DASHBOARD_PROFILING"),
+    directory=os.getenv("DASHBOARD_PROFILE_DIR", "./profiles"),
+    keep=int(os.getenv("DASHBOARD_PROFILE_KEEP", "20")),
+    token=os.getenv("DASHBOARD_PROFILE_TOKEN", ""),
+    require_token=os.getenv("ENVIRONMENT", "") != "development",
+)
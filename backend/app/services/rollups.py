@@ -0,0 +1,193 @@
+"""
+Activity Rollups - hourly and daily aggregates of the activities table
+Updated in the same transaction as each insert and rebuildable from raw data
+"""
+from collections import defaultdict
+
+import pandas as pd
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import models
+from app.schemas import naive_utc
+from app.services.ml_path import ml_path  # noqa: F401 - puts ml/ on sys.path
+from models.features import LATE_WORK_HOUR  # same "late" work as the anomaly detector
+
+HOURLY_SUMS = ['activity_count', 'score_count', 'productivity_sum']
+DAILY_SUMS = [
+    'activity_count',
+    'score_count',
+    'productivity_sum',
+    'work_minutes',
+    'break_count',
+    'late_work_minutes',
+]
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def compute_rollups(records):
+    """
+    Aggregate activity records into hourly and daily rollup rows
+
+    Args:
+        records: Iterable of mappings with user_id, timestamp, activity_type,
+            duration and productivity_score
+
+    Returns:
+        (hourly_rows, daily_rows) as lists of dicts keyed like the tables
+    """
+    hourly = defaultdict(lambda: dict.fromkeys(HOURLY_SUMS, 0))
+    daily = defaultdict(lambda: dict.fromkeys(DAILY_SUMS, 0))
+
+    for record in records:
+        timestamp = naive_utc(record['timestamp'])
+        user_id = record['user_id']
+        score = record['productivity_score']
+        duration = record['duration'] or 0
+
+        hour = hourly[(user_id, timestamp.replace(minute=0, second=0, microsecond=0))]
+        day = daily[(user_id, timestamp.date())]
+
+        for bucket in (hour, day):
+            bucket['activity_count'] += 1
+            if score is not None:
+                bucket['score_count'] += 1
+                bucket['productivity_sum'] += score
+
+        if record['activity_type'] == 'work':
+            day['work_minutes'] += duration
+            if timestamp.hour >= LATE_WORK_HOUR:
+                day['late_work_minutes'] += duration
+        elif record['activity_type'] == 'break':
+            day['break_count'] += 1
+
+    hourly_rows = [
+        {'user_id': user_id, 'bucket': bucket, **sums}
+        for (user_id, bucket), sums in hourly.items()
+    ]
+    daily_rows = [
+        {'user_id': user_id, 'bucket': bucket, **sums}
+        for (user_id, bucket), sums in daily.items()
+    ]
+    return hourly_rows, daily_rows
+
+
+async def apply_rollups(db, records):
+    """
+    Add freshly inserted activities to the rollup tables
+
+    Runs on the caller's AsyncSession so the rollups commit (or roll back)
+    together with the activities themselves.
+    """
+    hourly_rows, daily_rows = compute_rollups(records)
+    await _upsert(db, models.ActivityHourly, hourly_rows, HOURLY_SUMS)
+    await _upsert(db, models.ActivityDaily, daily_rows, DAILY_SUMS)
+
+
+async def _upsert(db, model, rows, sum_columns):
+    """Insert rollup rows, adding to the counters of buckets that already exist"""
+    if not rows:
+        return
+
+    table = model.__table__
+    make_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+
+    if make_insert is not None:
+        stmt = make_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.bucket],
+            set_={column: table.c[column] + stmt.excluded[column] for column in sum_columns}
+        )
+        await db.execute(stmt, rows)
+        return
+
+    # Portable fallback: read-modify-write each bucket
+    for row in rows:
+        existing = await db.get(model, (row['user_id'], row['bucket']))
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for column in sum_columns:
+                setattr(existing, column, getattr(existing, column) + row[column])
+
+
+def rebuild_rollups(db, user_id=None, batch_size=10000):
+    """
+    Recompute rollups from the raw activities table
+
+    Args:
+        db: Sync database session
+        user_id: Only rebuild this user (default: everyone)
+        batch_size: Rows fetched per round trip while streaming activities
+    """
+    activity_filter = [] if user_id is None else [models.Activity.user_id == user_id]
+
+    for model in (models.ActivityHourly, models.ActivityDaily):
+        rollup_filter = [] if user_id is None else [model.user_id == user_id]
+        db.execute(delete(model).where(*rollup_filter))
+
+    activities = db.execute(
+        select(
+            models.Activity.user_id,
+            models.Activity.timestamp,
+            models.Activity.activity_type,
+            models.Activity.duration,
+            models.Activity.productivity_score,
+        ).where(
+            models.Activity.timestamp.is_not(None), *activity_filter
+        ).execution_options(yield_per=batch_size)
+    ).mappings()
+
+    hourly_rows, daily_rows = compute_rollups(activities)
+    for model, rows in ((models.ActivityHourly, hourly_rows), (models.ActivityDaily, daily_rows)):
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(model), rows[start:start + batch_size])
+
+    db.commit()
+    print(f"✅ Rebuilt rollups: {len(hourly_rows)} hourly, {len(daily_rows)} daily buckets")
+
+
+def rollups_missing(db):
+    """True when there are activities but no rollups (e.g. tables just created)"""
+    has_activities = db.query(models.Activity.id).first() is not None
+    has_rollups = db.query(models.ActivityDaily.user_id).first() is not None
+    return has_activities and not has_rollups
+
+
+def load_hourly_rollup(db, user_id):
+    """A user's hourly rollup as a DataFrame ordered by bucket"""
+    table = models.ActivityHourly.__table__
+    rows = db.execute(
+        select(table.c.bucket, *[table.c[c] for c in HOURLY_SUMS])
+        .where(table.c.user_id == user_id)
+        .order_by(table.c.bucket)
+    ).all()
+    return pd.DataFrame.from_records(rows, columns=['bucket'] + HOURLY_SUMS)
+
+
+def load_daily_rollup(db, user_id):
+    """A user's daily rollup as a DataFrame ordered by date"""
+    table = models.ActivityDaily.__table__
+    rows = db.execute(
+        select(table.c.bucket, *[table.c[c] for c in DAILY_SUMS])
+        .where(table.c.user_id == user_id)
+        .order_by(table.c.bucket)
+    ).all()
+    return pd.DataFrame.from_records(rows, columns=['date'] + DAILY_SUMS)
+
+
+if __name__ == "__main__":
+    # Rebuild every user's rollups: python -m app.services.rollups
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
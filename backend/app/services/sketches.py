@@ -0,0 +1,98 @@
+"""
+Hourly Sketches - per-user running hour-of-day / hour-of-week productivity sums
+Updated in the same transaction as each insert and rebuildable from raw data
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import delete, select
+
+from app import models
+from app.services.ml_path import ml_path  # noqa: F401 - puts ml/ on sys.path
+from models.hourly_sketch import HourlySketch
+
+# Exponential decay of old activity in the sketch (unset = plain running totals)
+HALF_LIFE_DAYS = float(os.getenv("SKETCH_HALF_LIFE_DAYS", "0")) or None
+
+
+async def apply_sketches(db, records):
+    """
+    Add freshly inserted activities to their users' sketches
+
+    Runs on the caller's AsyncSession so the sketches commit (or roll back)
+    together with the activities themselves.
+    """
+    by_user = defaultdict(list)
+    for record in records:
+        by_user[record['user_id']].append(record)
+
+    for user_id, user_records in by_user.items():
+        row = await db.scalar(
+            select(models.ActivitySketch)
+            .where(models.ActivitySketch.user_id == user_id)
+            .with_for_update()
+        )
+        sketch = HourlySketch.from_bytes(row.data) if row is not None else HourlySketch(HALF_LIFE_DAYS)
+        sketch.add_many(sorted(user_records, key=lambda r: r['timestamp']))
+
+        if row is None:
+            db.add(models.ActivitySketch(user_id=user_id, data=sketch.to_bytes()))
+        else:
+            row.data = sketch.to_bytes()
+            row.updated_at = datetime.utcnow()
+
+
+def rebuild_sketches(db, user_id=None):
+    """
+    Recompute sketches from the raw activities table
+
+    Args:
+        db: Sync database session
+        user_id: Only rebuild this user (default: everyone)
+    """
+    activity_filter = [] if user_id is None else [models.Activity.user_id == user_id]
+    sketch_filter = [] if user_id is None else [models.ActivitySketch.user_id == user_id]
+    db.execute(delete(models.ActivitySketch).where(*sketch_filter))
+
+    rows = db.execute(
+        select(
+            models.Activity.user_id,
+            models.Activity.timestamp,
+            models.Activity.productivity_score,
+        ).where(models.Activity.timestamp.is_not(None), *activity_filter)
+    ).all()
+    activities = pd.DataFrame.from_records(rows, columns=['user_id', 'timestamp', 'productivity_score'])
+
+    for sketch_user, frame in activities.groupby('user_id'):
+        sketch = HourlySketch.from_frame(frame, HALF_LIFE_DAYS)
+        db.add(models.ActivitySketch(user_id=int(sketch_user), data=sketch.to_bytes()))
+
+    db.commit()
+    print(f"✅ Rebuilt hourly sketches for {activities['user_id'].nunique()} users")
+
+
+def sketches_missing(db):
+    """True when there are activities but no sketches (e.g. table just created)"""
+    has_activities = db.query(models.Activity.id).first() is not None
+    has_sketches = db.query(models.ActivitySketch.user_id).first() is not None
+    return has_activities and not has_sketches
+
+
+def load_sketch(db, user_id):
+    """A user's HourlySketch, or None if they have not logged anything"""
+    data = db.scalar(select(models.ActivitySketch.data).where(models.ActivitySketch.user_id == user_id))
+    return HourlySketch.from_bytes(data) if data is not None else None
+
+
+if __name__ == "__main__":
+    # Rebuild every user's sketch: python -m app.services.sketches
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild_sketches(db)
+    finally:
+        db.close()
@@ -0,0 +1,344 @@
+"""
+Benchmark the ML pipeline at realistic history lengths
+
+Generates a synthetic user for each history length (1 week to 3 years by
+default) and times every stage of the pipeline on it: feature prep,
+training, model load, predict, predict_pattern, detect and
+generate_recommendations. Each stage reports p50/p95 wall time plus peak
+Python memory (from a separate tracemalloc run, so tracing doesn't skew
+the timings). Results are written as JSON; --compare checks them against
+an earlier run and exits non-zero on regressions.
+
+Usage:
+    python benchmarks/benchmark_pipeline.py
+    python benchmarks/benchmark_pipeline.py --days 7,365 --output new.json --compare baseline.json
+"""
+import sys
+import os
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Fix imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.features import prepare_features
+from models.hourly_sketch import HourlySketch
+from models.productivity_predictor import ProductivityPredictor, FORECASTERS
+from models.pattern_recognition import PatternRecognizer
+from models.anomaly_detection import AnomalyDetector
+from models.recommendation_engine import RecommendationEngine
+
+DEFAULT_DAYS = [7, 30, 90, 365, 1095]
+
+# Stages in pipeline order (training is slow, so it has its own repeat count)
+STAGES = [
+    'prepare_features',
+    'train',
+    'load',
+    'predict',
+    'predict_pattern',
+    'predict_pattern_sketch',
+    'detect',
+    'generate_recommendations',
+]
+
+# A typical day: (hour, activity_type, baseline score, typical minutes)
+DAY_PLAN = [
+    (9.0, 'work', 8.5, 110),
+    (10.75, 'break', 5.0, 15),
+    (11.0, 'work', 8.0, 90),
+    (13.0, 'meeting', 6.0, 45),
+    (14.0, 'work', 6.5, 90),
+    (15.75, 'break', 5.0, 15),
+    (16.5, 'work', 6.0, 75),
+    (21.0, 'work', 4.5, 60),
+]
+
+
+def synthetic_history(days, user_id=1, seed=0, end='2025-01-01'):
+    """
+    A user's activity history over `days` days, generated without Python loops
+
+    Follows DAY_PLAN with jittered start times, durations and scores, and
+    drops ~20% of slots so days differ in shape.
+
+    Returns:
+        DataFrame in the demo_activities.csv layout, timestamps parsed (as
+        the backend's activity cache holds them)
+    """
+    rng = np.random.default_rng(seed)
+    hours, types, scores, minutes = (np.array(column) for column in zip(*DAY_PLAN))
+    slots = len(DAY_PLAN)
+    n = days * slots
+
+    day_starts = pd.Timestamp(end) - pd.to_timedelta(np.arange(days, 0, -1), unit='D')
+    offsets = np.tile(hours * 60, days) + rng.integers(-20, 21, n)
+    timestamps = day_starts.repeat(slots) + pd.to_timedelta(offsets, unit='m')
+
+    score = np.clip(np.round(np.tile(scores, days) + rng.normal(0, 1.2, n)), 1, 10).astype(int)
+    duration = np.maximum(5, np.tile(minutes, days) * rng.uniform(0.6, 1.4, n)).astype(int)
+    keep = rng.random(n) > 0.2
+
+    df = pd.DataFrame({
+        'user_id': user_id,
+        'timestamp': timestamps,
+        'activity_type': np.tile(types, days),
+        'duration': duration,
+        'productivity_score': score,
+        'focus_level': np.where(score >= 7, 'high', 'medium'),
+        'notes': '',
+    })
+    return df[keep].reset_index(drop=True)
+
+
+def summarize(samples):
+    """p50/p95/mean in milliseconds of a list of durations in seconds"""
+    ms = np.array(samples) * 1000
+    return {
+        'runs': len(ms),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+    }
+
+
+def measure(run, setup=None, repeats=10):
+    """
+    Time a stage and record its peak memory
+
+    Args:
+        run: Callable taking setup()'s result (or nothing) - the timed part
+        setup: Untimed callable run before each repetition
+        repeats: Timed repetitions
+
+    Returns:
+        summarize() dict plus peak_memory_kb
+    """
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            args = (setup(),) if setup else ()
+            start = time.perf_counter()
+            run(*args)
+            samples.append(time.perf_counter() - start)
+
+        args = (setup(),) if setup else ()
+        tracemalloc.start()
+        try:
+            run(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result = summarize(samples)
+    result['peak_memory_kb'] = round(peak / 1024, 1)
+    return result
+
+
+def benchmark_history(days, forecaster, repeats, train_repeats, seed):
+    """Time every stage on one synthetic user with `days` days of history"""
+    df = synthetic_history(days, seed=seed)
+    features = prepare_features(df)
+    stages = {}
+
+    stages['prepare_features'] = measure(lambda: prepare_features(df), repeats=repeats)
+
+    def train():
+        predictor = ProductivityPredictor(forecaster=forecaster)
+        predictor.fit(predictor.prepare_data(features))
+        recognizer = PatternRecognizer()
+        recognizer.fit_frame(features)
+        detector = AnomalyDetector()
+        detector.fit_daily(detector.prepare_daily_features(features))
+        return predictor, recognizer, detector
+
+    stages['train'] = measure(train, repeats=train_repeats)
+
+    # Save one trained set so loading reads real artifacts
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor, recognizer, detector = train()
+    models_dir = tempfile.mkdtemp(prefix='rehabit-bench-')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.save_model(os.path.join(models_dir, 'productivity_model.pkl'))
+            recognizer.save_model(os.path.join(models_dir, 'pattern_model.pkl'))
+            detector.save_model(os.path.join(models_dir, 'anomaly_model.pkl'))
+
+        def load():
+            ProductivityPredictor().load_model(os.path.join(models_dir, 'productivity_model.pkl'))
+            PatternRecognizer().load_model(os.path.join(models_dir, 'pattern_model.pkl'))
+            AnomalyDetector().load_model(os.path.join(models_dir, 'anomaly_model.pkl'))
+
+        stages['load'] = measure(load, repeats=repeats)
+    finally:
+        shutil.rmtree(models_dir, ignore_errors=True)
+
+    def cold_predictor():
+        # Forget memoized forecasts so every run computes one
+        predictor._model_changed()
+        return predictor
+
+    stages['predict'] = measure(lambda p: p.predict(periods=24), setup=cold_predictor, repeats=repeats)
+    stages['predict_pattern'] = measure(lambda: recognizer.predict_pattern(features), repeats=repeats)
+
+    sketch = HourlySketch.from_frame(features)
+    stages['predict_pattern_sketch'] = measure(lambda: recognizer.predict_pattern(sketch=sketch), repeats=repeats)
+    stages['detect'] = measure(lambda: detector.detect(features), repeats=repeats)
+
+    predictions = predictor.predict(periods=24)
+    pattern = recognizer.predict_pattern(features)
+    anomaly = detector.detect(features)
+    engine = RecommendationEngine()
+    stages['generate_recommendations'] = measure(
+        lambda: engine.generate_recommendations(features, predictions, pattern, anomaly),
+        repeats=repeats
+    )
+
+    return {'days': days, 'rows': len(df), 'stages': stages}
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    Find stages slower (p50) or hungrier (peak memory) than in the baseline
+
+    Args:
+        results: This run's output
+        baseline: An earlier run's output
+        threshold: Allowed relative increase (0.25 = 25%)
+        min_delta_ms: Ignore time increases smaller than this (timer noise)
+
+    Returns:
+        List of regression dicts
+    """
+    previous = {entry['days']: entry['stages'] for entry in baseline['histories']}
+    regressions = []
+
+    for entry in results['histories']:
+        for stage, current in entry['stages'].items():
+            before = previous.get(entry['days'], {}).get(stage)
+            if before is None:
+                continue
+
+            checks = [
+                ('p50_ms', min_delta_ms),
+                ('peak_memory_kb', 0),
+            ]
+            for metric, floor in checks:
+                old, new = before.get(metric), current.get(metric)
+                if not old or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > floor:
+                    regressions.append({
+                        'days': entry['days'],
+                        'stage': stage,
+                        'metric': metric,
+                        'baseline': old,
+                        'current': new,
+                        'change': round(new / old - 1, 3),
+                    })
+
+    return regressions
+
+
+def print_table(results):
+    """Per-stage p50/p95/peak memory for every history length"""
+    for entry in results['histories']:
+        print()
+        print(f"📊 {entry['days']} days ({entry['rows']} activities)")
+        print(f"   {'stage':<26}{'p50 ms':>10}{'p95 ms':>10}{'peak KB':>12}")
+        for stage in STAGES:
+            result = entry['stages'][stage]
+            print(f"   {stage:<26}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['peak_memory_kb']:>12.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ML pipeline at realistic history lengths")
+    parser.add_argument(
+        '--days',
+        default=','.join(str(days) for days in DEFAULT_DAYS),
+        help="Comma-separated history lengths in days (default: %(default)s)"
+    )
+    parser.add_argument('--forecaster', choices=FORECASTERS, default='prophet',
+                        help="Productivity forecaster backend (default: prophet)")
+    parser.add_argument('--repeats', type=int, default=20,
+                        help="Timed runs per stage (default: 20)")
+    parser.add_argument('--train-repeats', type=int, default=3,
+                        help="Timed runs of the training stage (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.json'),
+                        help="Where to write the JSON results (default: benchmarks/results.json)")
+    parser.add_argument('--compare', help="Earlier results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Relative slowdown counted as a regression (default: 0.25)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="Ignore p50 increases smaller than this (default: 1.0)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    history_days = [int(days) for days in args.days.split(',') if days.strip()]
+
+    print("="*60)
+    print("⏱️  ML Pipeline Benchmark")
+    print("="*60)
+
+    histories = []
+    for days in history_days:
+        start = time.perf_counter()
+        histories.append(benchmark_history(days, args.forecaster, args.repeats, args.train_repeats, args.seed))
+        print(f"✅ {days} days benchmarked in {time.perf_counter() - start:.1f}s")
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'forecaster': args.forecaster,
+        'repeats': args.repeats,
+        'train_repeats': args.train_repeats,
+        'seed': args.seed,
+        'histories': histories,
+    }
+
+    print_table(results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print()
+    print(f"💾 Results saved to {args.output}")
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if baseline.get('forecaster') != results['forecaster']:
+        print(f"⚠️  Baseline used the {baseline.get('forecaster')} forecaster, this run {results['forecaster']}")
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+
+    print()
+    if not regressions:
+        print(f"✅ No regressions against {args.compare}")
+        return 0
+
+    print(f"⚠️  {len(regressions)} regression(s) against {args.compare}:")
+    for regression in regressions:
+        print(f"   {regression['days']:>5} days  {regression['stage']:<26}{regression['metric']:<16}"
+              f"{regression['baseline']:>10} -> {regression['current']:<10} (+{regression['change']:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Columnar Activity Store
+Per-user activity history as memory-mapped Arrow files, so loading a history
+for training or serving skips CSV/SQL parsing and, for the numeric and
+timestamp columns, copying
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Stored columns, in the demo_activities.csv / activities table order.
+# user_id is the partition key, so it lives in the directory name instead.
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('ns')),
+    ('activity_type', pa.dictionary(pa.int32(), pa.string())),
+    ('duration', pa.int64()),
+    ('productivity_score', pa.float64()),  # NaN when unscored, never null
+    ('focus_level', pa.dictionary(pa.int32(), pa.string())),
+    ('notes', pa.dictionary(pa.int32(), pa.string())),
+])
+COLUMNS = ['user_id'] + SCHEMA.names
+
+# Appends beyond this many part files are merged back into one
+MAX_PARTS = 16
+
+PART_SUFFIX = '.arrow'
+
+
+class ActivityStore:
+    """
+    Directory of Arrow IPC files partitioned by user:
+
+        <root>/user_id=<id>/part-<nanoseconds>-<pid>.arrow
+
+    Files are uncompressed so reads memory-map them: timestamp, duration
+    and productivity_score come back as read-only views of the mapped
+    file, and the string columns as pandas categoricals. Appends add a part
+    file; a user's parts are merged once there are more than MAX_PARTS.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def user_ids(self):
+        """Every user with stored history"""
+        return sorted(
+            int(name.split('=', 1)[1]) for name in os.listdir(self.root)
+            if name.startswith('user_id=') and self._parts(int(name.split('=', 1)[1]))
+        )
+
+    def has_user(self, user_id):
+        return bool(self._parts(user_id))
+
+    def read_user(self, user_id, columns=None):
+        """
+        Read a user's history
+
+        Args:
+            user_id: User to read
+            columns: Columns to load (default: all of COLUMNS); the rest of
+                the file is never touched
+
+        Returns:
+            DataFrame ordered by timestamp, or None if the user has no history
+        """
+        table = self.read_table(user_id, columns)
+        if table is None:
+            return None
+
+        frame = table.to_pandas(split_blocks=True)
+        if columns is None or 'user_id' in columns:
+            frame.insert(0, 'user_id', user_id)
+        if 'timestamp' in frame and not frame['timestamp'].is_monotonic_increasing:
+            frame = frame.sort_values('timestamp', kind='stable', ignore_index=True)
+        return frame
+
+    def read_table(self, user_id, columns=None):
+        """A user's history as a (memory-mapped) Arrow table, in storage order"""
+        parts = self._parts(user_id)
+        if not parts:
+            return None
+
+        names = [name for name in (columns or SCHEMA.names) if name != 'user_id']
+        tables = [self._read_part(path).select(names) for path in parts]
+        return tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+    def read_users(self, user_ids=None, columns=None):
+        """Several users' histories in one DataFrame with a user_id column, ordered by user then time"""
+        user_ids = sorted(self.user_ids() if user_ids is None else user_ids)
+        names = [name for name in (columns or SCHEMA.names) if name != 'user_id']
+
+        # Concatenate in Arrow and convert once, rather than per user
+        tables = []
+        for user_id in user_ids:
+            table = self.read_table(user_id, names)
+            if table is not None:
+                tables.append(table.add_column(0, 'user_id', pa.array(np.full(table.num_rows, user_id, dtype=np.int64))))
+        if not tables:
+            return pd.DataFrame(columns=['user_id'] + names)
+
+        frame = pa.concat_tables(tables).to_pandas(split_blocks=True)
+        if 'timestamp' in frame:
+            # Only backfilled appends are out of order; skip the sort otherwise
+            same_user = np.diff(frame['user_id'].to_numpy()) == 0
+            backwards = np.diff(frame['timestamp'].to_numpy()) < np.timedelta64(0)
+            if (same_user & backwards).any():
+                frame = frame.sort_values(['user_id', 'timestamp'], kind='stable', ignore_index=True)
+        return frame
+
+    def fingerprint(self, user_id):
+        """(row count, newest timestamp) without loading anything but timestamps"""
+        table = self.read_table(user_id, ['timestamp'])
+        if table is None:
+            return 0, None
+        newest = pc.max(table['timestamp']).as_py()
+        return table.num_rows, newest
+
+    def write_user(self, user_id, df):
+        """Replace a user's stored history with df"""
+        with self._lock:
+            old_parts = self._parts(user_id)
+            self._write_part(user_id, self.to_table(df))
+            for path in old_parts:
+                os.remove(path)
+
+    def append(self, user_id, df):
+        """Add newly logged activities to a user's history"""
+        if len(df) == 0:
+            return
+        with self._lock:
+            self._write_part(user_id, self.to_table(df))
+            if len(self._parts(user_id)) > MAX_PARTS:
+                self._compact(user_id)
+
+    def drop_user(self, user_id):
+        """Delete a user's stored history"""
+        with self._lock:
+            for path in self._parts(user_id):
+                os.remove(path)
+
+    def compact(self, user_id):
+        """Merge a user's part files into one, ordered by timestamp"""
+        with self._lock:
+            self._compact(user_id)
+
+    def import_frame(self, df):
+        """Store every user in a multi-user DataFrame (replacing their history)"""
+        for user_id, frame in df.groupby('user_id', sort=False):
+            self.write_user(int(user_id), frame)
+
+    @staticmethod
+    def to_table(df):
+        """Convert activity rows (any of COLUMNS, others ignored) to the stored schema"""
+        n = len(df)
+
+        def strings(name):
+            values = df[name].astype(object).to_numpy() if name in df else np.full(n, None, dtype=object)
+            return pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode()
+
+        timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]')
+        scores = pd.to_numeric(df['productivity_score'], errors='coerce').to_numpy(dtype=float) \
+            if 'productivity_score' in df else np.full(n, np.nan)
+        durations = pd.to_numeric(df['duration'], errors='coerce') if 'duration' in df else pd.Series(np.nan, index=df.index)
+
+        return pa.Table.from_arrays([
+            pa.array(timestamps, type=pa.timestamp('ns')),
+            strings('activity_type'),
+            pa.array(durations.to_numpy(dtype=float), type=pa.int64(), from_pandas=True),
+            pa.array(scores, type=pa.float64()),
+            strings('focus_level'),
+            strings('notes'),
+        ], schema=SCHEMA)
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.root, f'user_id={int(user_id)}')
+
+    def _parts(self, user_id):
+        """A user's part files, oldest first"""
+        directory = self._user_dir(user_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.endswith(PART_SUFFIX)
+        )
+
+    @staticmethod
+    def _read_part(path):
+        # The table keeps the mapping alive; pages are read as columns are touched
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    def _write_part(self, user_id, table):
+        """Write a part file atomically (lock held)"""
+        directory = self._user_dir(user_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'part-{time.time_ns():020d}-{os.getpid()}{PART_SUFFIX}')
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return path
+
+    def _compact(self, user_id):
+        """Merge part files (lock held)"""
+        parts = self._parts(user_id)
+        if len(parts) <= 1:
+            return
+        table = pa.concat_tables([self._read_part(path) for path in parts])
+        table = table.unify_dictionaries().combine_chunks()
+        order = pc.sort_indices(table, sort_keys=[('timestamp', 'ascending')])
+        self._write_part(user_id, table.take(order))
+        for path in parts:
+            os.remove(path)
@@ -10,7 +10,26 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 import os
 
+try:
+    from models.burnout_rules import rule_alerts, risk_level
+    from models.features import prepare_features
+except ImportError:  # run as a script from ml/models
+    from burnout_rules import rule_alerts, risk_level
+    from features import prepare_features
+
 class AnomalyDetector:
+    # Activity columns prepare_daily_features reads
+    COLUMNS = ['timestamp', 'activity_type', 'duration', 'productivity_score']
+    
+    # Daily feature columns, in model input order
+    FEATURES = [
+        'total_work_hours',
+        'avg_productivity',
+        'break_count',
+        'late_work_hours',
+        'activity_count'
+    ]
+    
     def __init__(self, contamination=0.1):
         self.model = IsolationForest(
             contamination=contamination,
@@ -19,40 +38,76 @@ class AnomalyDetector:
         )
         self.scaler = StandardScaler()
         
-    def prepare_daily_features(self, df):
-        """Aggregate data by day and create features"""
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
-        
-        daily_data = []
+    def prepare_daily_features(self, df, window_days=None):
+        """
+        Aggregate data by day and create features
         
-        for date in df['date'].unique():
-            day_data = df[df['date'] == date]
-            
-            # Calculate daily metrics
-            total_work = day_data[day_data['activity_type'] == 'work']['duration'].sum()
-            avg_productivity = day_data['productivity_score'].mean()
-            break_count = len(day_data[day_data['activity_type'] == 'break'])
-            
-            # Late work (after 8 PM)
-            late_work = day_data[
-                (day_data['activity_type'] == 'work') & 
-                (day_data['timestamp'].dt.hour >= 20)
-            ]['duration'].sum()
-            
-            # Number of activities
-            activity_count = len(day_data)
+        Args:
+            df: DataFrame with activity data, ideally already prepared with
+                features.prepare_features (df itself is never modified)
+            window_days: Only aggregate the trailing N calendar days (ending
+                on the latest date in df); default aggregates everything
             
-            daily_data.append({
-                'date': date,
-                'total_work_hours': total_work / 60,
-                'avg_productivity': avg_productivity,
-                'break_count': break_count,
-                'late_work_hours': late_work / 60,
-                'activity_count': activity_count
-            })
+        Returns:
+            DataFrame with one row per day, in order of first appearance
+        """
+        df = prepare_features(df)
+        
+        if window_days is not None:
+            days = df['date']
+            cutoff = days.max() - pd.Timedelta(days=window_days - 1)
+            df = df[(days >= cutoff).values]
+        
+        if len(df) == 0:
+            return pd.DataFrame(columns=['date'] + self.FEATURES)
+        
+        # One pass: per-row contributions, then a single groupby over days
+        duration = df['duration'].values
         
-        return pd.DataFrame(daily_data)
+        contributions = pd.DataFrame({
+            'day': df['date'].values,
+            'work': np.where(df['is_work'].values, duration, 0),
+            'late': np.where(df['is_late'].values, duration, 0),
+            'is_break': df['is_break'].values,
+            'score': df['productivity_score'].values
+        })
+        daily = contributions.groupby('day', sort=False).agg(
+            work=('work', 'sum'),
+            late=('late', 'sum'),
+            break_count=('is_break', 'sum'),
+            avg_productivity=('score', 'mean'),
+            activity_count=('score', 'size')
+        )
+        
+        return pd.DataFrame({
+            'date': daily.index.date,
+            'total_work_hours': daily['work'].values / 60,
+            'avg_productivity': daily['avg_productivity'].values,
+            'break_count': daily['break_count'].values.astype(np.int64),
+            'late_work_hours': daily['late'].values / 60,
+            'activity_count': daily['activity_count'].values.astype(np.int64)
+        })
+    
+    def prepare_rollup_features(self, daily_rollup):
+        """
+        Create daily features from a pre-aggregated daily rollup
+        
+        Args:
+            daily_rollup: DataFrame with one row per day and columns [date,
+                activity_count, score_count, productivity_sum, work_minutes,
+                break_count, late_work_minutes] (the activity_daily table)
+            
+        Returns:
+            DataFrame in the same layout as prepare_daily_features
+        """
+        return pd.DataFrame({
+            'date': daily_rollup['date'].values,
+            'total_work_hours': daily_rollup['work_minutes'].values / 60,
+            'avg_productivity': daily_rollup['productivity_sum'].values / daily_rollup['score_count'].values,
+            'break_count': daily_rollup['break_count'].values,
+            'late_work_hours': daily_rollup['late_work_minutes'].values / 60,
+            'activity_count': daily_rollup['activity_count'].values
+        })
     
     def train(self, data_path):
         """
@@ -69,14 +124,22 @@ class AnomalyDetector:
         daily_df = self.prepare_daily_features(df)
         print(f"📊 Aggregated to {len(daily_df)} days")
         
+        self.fit_daily(daily_df)
+    
+    def train_from_rollup(self, daily_rollup):
+        """
+        Train anomaly detection model on a daily rollup
+        
+        Args:
+            daily_rollup: DataFrame in activity_daily layout (see prepare_rollup_features)
+        """
+        print("🎓 Training Anomaly Detector from daily rollup...")
+        self.fit_daily(self.prepare_rollup_features(daily_rollup))
+    
+    def fit_daily(self, daily_df):
+        """Fit scaler and model on daily features"""
         # Prepare features
-        features = daily_df[[
-            'total_work_hours',
-            'avg_productivity',
-            'break_count',
-            'late_work_hours',
-            'activity_count'
-        ]].values
+        features = daily_df[self.FEATURES].values
         
         # Scale and train
         features_scaled = self.scaler.fit_transform(features)
@@ -84,92 +147,101 @@ class AnomalyDetector:
         
         print("✅ Anomaly detector trained")
     
-    def detect(self, df):
+    def detect(self, df=None, daily_df=None, window_days=1):
         """
         Detect anomalies in recent behavior
         
         Args:
             df: DataFrame with recent activity data
+            daily_df: Daily features already prepared (e.g. with
+                prepare_rollup_features); skips aggregating df
+            window_days: Trailing days to aggregate and score. Only the
+                latest day is reported, and each day is scored on its own,
+                so the default of 1 skips the rest of the history entirely.
+                None scores every day.
             
         Returns:
             Dictionary with anomaly analysis
         """
-        daily_df = self.prepare_daily_features(df)
+        if daily_df is None:
+            daily_df = self.prepare_daily_features(df, window_days=window_days)
+        elif window_days is not None and len(daily_df) > 0:
+            dates = pd.to_datetime(daily_df['date'])
+            cutoff = dates.max() - pd.Timedelta(days=window_days - 1)
+            daily_df = daily_df[(dates >= cutoff).values]
         
         if len(daily_df) == 0:
-            return {
-                'is_anomaly': False,
-                'anomaly_score': 0.0,
-                'risk_level': 'normal',
-                'alerts': [],
-                'metrics': {}
-            }
+            return self._empty_result()
         
-        # Prepare features
-        features = daily_df[[
-            'total_work_hours',
-            'avg_productivity',
-            'break_count',
-            'late_work_hours',
-            'activity_count'
-        ]].values
-        
-        # Scale and predict
-        features_scaled = self.scaler.transform(features)
-        predictions = self.model.predict(features_scaled)
-        scores = self.model.score_samples(features_scaled)
-        
-        # Check if latest day is anomaly (-1 = anomaly, 1 = normal)
-        is_anomaly = predictions[-1] == -1
-        
-        # Get latest day metrics
+        # Score only the latest day (-1 = anomaly, 1 = normal)
         latest_day = daily_df.iloc[-1]
+        scores, predictions = self.score(daily_df[self.FEATURES].values[-1:])
+        
+        return self._build_result(latest_day, predictions[0] == -1, scores[0])
+    
+    def detect_many(self, frames_by_user, window_days=1):
+        """
+        Detect anomalies for many users with a single model call
         
-        # Generate specific alerts
-        alerts = []
-        
-        if latest_day['total_work_hours'] > 10:
-            alerts.append({
-                'type': 'overwork',
-                'severity': 'high',
-                'message': f"Working {latest_day['total_work_hours']:.1f} hours - that's too much!"
-            })
-        
-        if latest_day['break_count'] < 2:
-            alerts.append({
-                'type': 'no_breaks',
-                'severity': 'high',
-                'message': f"Only {latest_day['break_count']} breaks today - take more breaks!"
-            })
-        
-        if latest_day['late_work_hours'] > 2:
-            alerts.append({
-                'type': 'late_work',
-                'severity': 'medium',
-                'message': f"Worked {latest_day['late_work_hours']:.1f} hours after 8 PM"
-            })
-        
-        if latest_day['avg_productivity'] < 5:
-            alerts.append({
-                'type': 'low_productivity',
-                'severity': 'medium',
-                'message': f"Productivity at {latest_day['avg_productivity']:.1f}/10 - below your average"
-            })
-        
-        # Determine risk level
-        if is_anomaly and len(alerts) >= 3:
-            risk_level = 'critical'
-        elif is_anomaly and len(alerts) >= 2:
-            risk_level = 'high'
-        elif len(alerts) >= 1:
-            risk_level = 'medium'
-        else:
-            risk_level = 'normal'
+        Args:
+            frames_by_user: Dict of user_id -> DataFrame with activity data
+            window_days: Trailing days to aggregate per user (see detect)
+            
+        Returns:
+            Dict of user_id -> anomaly analysis, same format as detect
+        """
+        results = {}
+        latest_days = {}
+        
+        for user_id, df in frames_by_user.items():
+            daily_df = self.prepare_daily_features(df, window_days=window_days)
+            if len(daily_df) == 0:
+                results[user_id] = self._empty_result()
+            else:
+                latest_days[user_id] = daily_df.iloc[-1]
+        
+        if latest_days:
+            # Stack every user's latest day and score them in one pass
+            features = np.array(
+                [[day[name] for name in self.FEATURES] for day in latest_days.values()],
+                dtype=float
+            )
+            scores, predictions = self.score(features)
+            
+            for (user_id, latest_day), score, prediction in zip(latest_days.items(), scores, predictions):
+                results[user_id] = self._build_result(latest_day, prediction == -1, score)
+        
+        return {user_id: results[user_id] for user_id in frames_by_user}
+    
+    def score(self, features):
+        """
+        Score daily feature rows
+        
+        Args:
+            features: Array of shape (n_days, len(FEATURES))
+            
+        Returns:
+            (scores, predictions) - IsolationForest score_samples and the
+            matching -1/1 labels, derived from the same scores so the
+            forest is only traversed once
+        """
+        scores = self.model.score_samples(self.scaler.transform(features))
+        # Same rule as IsolationForest.predict: decision_function < 0 is an anomaly
+        predictions = np.where(scores - self.model.offset_ < 0, -1, 1)
+        return scores, predictions
+    
+    # Rule-based alerts live in burnout_rules so they can be used without scikit-learn
+    rule_alerts = staticmethod(rule_alerts)
+    risk_level = staticmethod(risk_level)
+    
+    def _build_result(self, latest_day, is_anomaly, score):
+        """Assemble the detect() result for a user's latest day"""
+        alerts = self.rule_alerts(latest_day)
         
         return {
             'is_anomaly': bool(is_anomaly),
-            'anomaly_score': float(scores[-1]),
-            'risk_level': risk_level,
+            'anomaly_score': float(score),
+            'risk_level': self.risk_level(is_anomaly, alerts),
             'alerts': alerts,
             'metrics': {
                 'work_hours': float(latest_day['total_work_hours']),
@@ -179,13 +251,25 @@ class AnomalyDetector:
             }
         }
     
+    def _empty_result(self):
+        """Result for a user with no activity to analyse"""
+        return {
+            'is_anomaly': False,
+            'anomaly_score': 0.0,
+            'risk_level': 'normal',
+            'alerts': [],
+            'metrics': {}
+        }
+    
     def save_model(self, path):
         """Save model"""
         os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Through a temporary file, so a running backend never loads half of it
         joblib.dump({
             'model': self.model,
             'scaler': self.scaler
-        }, path)
+        }, path + '.tmp')
+        os.replace(path + '.tmp', path)
         print(f"💾 Anomaly model saved to {path}")
     
     def load_model(self, path):
@@ -0,0 +1,79 @@
+"""
+Burnout Rules
+Rule-based burnout alerts for one day of activity metrics, shared by
+AnomalyDetector and the streaming alert monitor (no scikit-learn needed)
+"""
+
+def rule_alerts(day):
+    """
+    Rule-based burnout alerts for one day of metrics
+    
+    Args:
+        day: Mapping with total_work_hours, break_count,
+            late_work_hours and avg_productivity
+    
+    Returns:
+        List of alert dictionaries
+    """
+    alerts = []
+    
+    if day['total_work_hours'] > 10:
+        alerts.append({
+            'type': 'overwork',
+            'severity': 'high',
+            'message': f"Working {day['total_work_hours']:.1f} hours - that's too much!"
+        })
+    
+    if day['break_count'] < 2:
+        alerts.append({
+            'type': 'no_breaks',
+            'severity': 'high',
+            'message': f"Only {day['break_count']} breaks today - take more breaks!"
+        })
+    
+    if day['late_work_hours'] > 2:
+        alerts.append({
+            'type': 'late_work',
+            'severity': 'medium',
+            'message': f"Worked {day['late_work_hours']:.1f} hours after 8 PM"
+        })
+    
+    if day['avg_productivity'] < 5:
+        alerts.append({
+            'type': 'low_productivity',
+            'severity': 'medium',
+            'message': f"Productivity at {day['avg_productivity']:.1f}/10 - below your average"
+        })
+    
+    return alerts
+
+
+def risk_level(is_anomaly, alerts):
+    """Combine the model verdict and rule alerts into a risk level"""
+    if is_anomaly and len(alerts) >= 3:
+        return 'critical'
+    elif is_anomaly and len(alerts) >= 2:
+        return 'high'
+    elif len(alerts) >= 1:
+        return 'medium'
+    return 'normal'
+
+
+def day_metrics(counters):
+    """
+    Rule inputs from one day of running counters (an activity_daily row)
+    
+    Args:
+        counters: Mapping with work_minutes, break_count, late_work_minutes,
+            productivity_sum and score_count
+        
+    Returns:
+        Mapping accepted by rule_alerts
+    """
+    score_count = counters['score_count']
+    return {
+        'total_work_hours': counters['work_minutes'] / 60,
+        'avg_productivity': counters['productivity_sum'] / score_count if score_count else float('nan'),
+        'break_count': counters['break_count'],
+        'late_work_hours': counters['late_work_minutes'] / 60,
+    }
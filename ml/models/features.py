@@ -0,0 +1,78 @@
+"""
+Shared Activity Features
+Parses an activity frame once and derives the columns every model needs,
+so a request hands the same prepared frame to all four models
+"""
+import numpy as np
+import pandas as pd
+
+# Work that starts at or after this hour counts as late work
+LATE_WORK_HOUR = 20
+
+# Marker in DataFrame.attrs; pandas carries attrs over to row subsets
+PREPARED_ATTR = 'rehabit_features'
+
+# Columns added by prepare_features
+DERIVED_COLUMNS = ['hour', 'date', 'is_work', 'is_break', 'is_late']
+
+
+def prepare_features(df):
+    """
+    Parse timestamps and derive the shared feature columns in one pass
+
+    The result is a new frame over read-only arrays: the original columns
+    (with timestamp as datetime64) plus
+        hour      hour of day (float with NaN where the timestamp is missing)
+        date      calendar day, as midnight datetime64
+        is_work   activity_type == 'work'
+        is_break  activity_type == 'break'
+        is_late   work starting at or after LATE_WORK_HOUR
+    Writing into it raises; models read it without copying. df itself is
+    left untouched.
+
+    Args:
+        df: DataFrame with a timestamp column, plus activity_type, duration
+            and productivity_score as the models need them
+
+    Returns:
+        Prepared DataFrame (df itself if it is already prepared)
+    """
+    if is_prepared(df):
+        return df
+
+    timestamps = df['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+
+    if 'activity_type' in df:
+        activity_type = df['activity_type'].to_numpy()
+    else:
+        activity_type = np.full(len(df), None, dtype=object)
+    is_work = activity_type == 'work'
+    hour = timestamps.dt.hour.to_numpy(dtype=float)
+
+    columns = {name: df[name].to_numpy() for name in df.columns if name not in DERIVED_COLUMNS}
+    columns.update({
+        'timestamp': timestamps.to_numpy(),
+        'hour': hour,
+        'date': timestamps.dt.normalize().to_numpy(),
+        'is_work': is_work,
+        'is_break': activity_type == 'break',
+        'is_late': is_work & (hour >= LATE_WORK_HOUR),
+    })
+
+    frozen = {}
+    for name, values in columns.items():
+        # A read-only view: the caller's arrays stay writable, ours don't
+        view = values.view()
+        view.flags.writeable = False
+        frozen[name] = view
+
+    features = pd.DataFrame(frozen, index=df.index, copy=False)
+    features.attrs[PREPARED_ATTR] = True
+    return features
+
+
+def is_prepared(df):
+    """True if df came out of prepare_features (or is a row subset of such a frame)"""
+    return bool(df.attrs.get(PREPARED_ATTR)) and all(name in df for name in DERIVED_COLUMNS)
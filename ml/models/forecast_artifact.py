@@ -0,0 +1,302 @@
+"""
+Compact Forecast Artifacts
+Stores only the fitted parameters a forecaster needs, instead of a pickled
+Prophet object with its training history, in a small versioned binary format
+"""
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+try:
+    from models.seasonal_forecaster import SeasonalForecaster
+except ImportError:  # run as a script from ml/models
+    from seasonal_forecaster import SeasonalForecaster
+
+# File layout: MAGIC, uint16 format version, uint32 header length,
+# UTF-8 JSON header, then each array's raw little-endian bytes in header order
+MAGIC = b'RHFC'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<4sHI')
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class CompactProphet:
+    """
+    Forecast-only stand-in for a fitted Prophet model
+
+    Keeps the trend parameters, changepoints, scales and seasonality
+    coefficients and reproduces Prophet's predict(): the same point forecast,
+    and intervals from the same trend/noise simulation (seeded, so repeated
+    forecasts are stable). Linear or flat growth with plain seasonalities
+    only - models with holidays, regressors or conditions stay pickled.
+    """
+
+    def __init__(self, state, arrays):
+        self.growth = state['growth']
+        self.start = pd.Timestamp(state['start'])
+        self.t_scale = float(state['t_scale'])  # seconds
+        self.y_scale = float(state['y_scale'])
+        self.floor = float(state['floor'])
+        self.last_ds = pd.Timestamp(state['last_ds'])
+        self.history_step = float(state['history_step'])
+        self.interval_width = float(state['interval_width'])
+        self.uncertainty_samples = int(state['uncertainty_samples'])
+        self.seasonalities = state['seasonalities']  # [name, period, fourier_order, mode]
+
+        self.k = arrays['k']
+        self.m = arrays['m']
+        self.delta = arrays['delta']
+        self.beta = arrays['beta']
+        self.sigma_obs = arrays['sigma_obs']
+        self.changepoints_t = arrays['changepoints_t']
+
+        # Which beta columns are multiplicative
+        modes = []
+        for _, _, order, mode in self.seasonalities:
+            modes.extend([mode == 'multiplicative'] * (2 * order))
+        self._multiplicative = np.array(modes, dtype=bool)
+
+    @classmethod
+    def from_prophet(cls, model):
+        """Extract the forecast state of a fitted Prophet model"""
+        if model.growth not in ('linear', 'flat'):
+            raise ValueError(f"Unsupported growth '{model.growth}'")
+        if model.holidays is not None or model.extra_regressors or model.logistic_floor:
+            raise ValueError("Holidays, extra regressors and floors are not supported")
+        if any(props['condition_name'] for props in model.seasonalities.values()):
+            raise ValueError("Conditional seasonalities are not supported")
+
+        history_t = model.history['t'].values
+        state = {
+            'growth': model.growth,
+            'start': model.start.isoformat(),
+            't_scale': model.t_scale.total_seconds(),
+            'y_scale': float(model.y_scale),
+            'floor': float(model.y_min) if model.scaling == 'minmax' else 0.0,
+            'last_ds': model.history_dates.max().isoformat(),
+            'history_step': float(np.diff(history_t).mean()) if len(history_t) > 1 else 0.0,
+            'interval_width': float(model.interval_width),
+            'uncertainty_samples': int(model.uncertainty_samples or 0),
+            'seasonalities': [
+                [name, float(props['period']), int(props['fourier_order']), props['mode']]
+                for name, props in model.seasonalities.items()
+            ],
+        }
+        arrays = {
+            'k': np.asarray(model.params['k'], dtype=np.float64).reshape(-1),
+            'm': np.asarray(model.params['m'], dtype=np.float64).reshape(-1),
+            'sigma_obs': np.asarray(model.params['sigma_obs'], dtype=np.float64).reshape(-1),
+            'delta': np.atleast_2d(np.asarray(model.params['delta'], dtype=np.float64)),
+            'beta': np.atleast_2d(np.asarray(model.params['beta'], dtype=np.float64)),
+            'changepoints_t': np.asarray(model.changepoints_t, dtype=np.float64).reshape(-1),
+        }
+        return cls(state, arrays)
+
+    def predict(self, future):
+        """
+        Prophet-compatible prediction
+
+        Args:
+            future: DataFrame with a 'ds' column
+
+        Returns:
+            DataFrame with columns [ds, yhat, yhat_lower, yhat_upper]
+        """
+        ds = pd.to_datetime(future['ds'])
+        t = ((ds - self.start).dt.total_seconds() / self.t_scale).values
+
+        X = self._seasonal_features(ds)
+        mean_beta = self.beta.mean(axis=0)
+        multiplicative = X @ (mean_beta * self._multiplicative)
+        additive = X @ (mean_beta * ~self._multiplicative) * self.y_scale
+
+        trend = self._trend(t, self.k.mean(), self.m.mean(), self.delta.mean(axis=0))
+        trend = trend * self.y_scale + self.floor
+        yhat = trend * (1 + multiplicative) + additive
+
+        result = pd.DataFrame({'ds': future['ds'].values, 'yhat': yhat})
+        if self.uncertainty_samples:
+            lower, upper = self._intervals(t, X)
+            result['yhat_lower'] = lower
+            result['yhat_upper'] = upper
+        else:
+            result['yhat_lower'] = yhat
+            result['yhat_upper'] = yhat
+        return result
+
+    def _seasonal_features(self, ds):
+        """Fourier features for every seasonality, in beta column order"""
+        days = (ds - pd.Timestamp('1970-01-01')).dt.total_seconds().values / SECONDS_PER_DAY
+        columns = []
+        for _, period, order, _ in self.seasonalities:
+            angles = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+            block = np.empty((len(days), 2 * order))
+            block[:, 0::2] = np.sin(angles)
+            block[:, 1::2] = np.cos(angles)
+            columns.append(block)
+        if not columns:
+            return np.zeros((len(days), 0))
+        return np.hstack(columns)
+
+    def _trend(self, t, k, m, deltas):
+        """Piecewise-linear (or flat) trend on the scaled time axis"""
+        if self.growth == 'flat':
+            return np.full_like(t, m)
+        active = (self.changepoints_t[None, :] <= t[:, None]) * deltas
+        return (active.sum(axis=1) + k) * t + (active * -self.changepoints_t).sum(axis=1) + m
+
+    def _intervals(self, t, X):
+        """Quantiles of simulated futures, as in Prophet.predict_uncertainty"""
+        rng = np.random.default_rng(0)
+        n_iterations = len(self.k)
+        per_iteration = max(1, int(np.ceil(self.uncertainty_samples / n_iterations)))
+        future = t > 1
+        n_future = int(future.sum())
+
+        if n_future > 1:
+            step = np.diff(t[future]).mean()
+        else:
+            step = self.history_step
+
+        sims = []
+        for i in range(n_iterations):
+            deltas = self.delta[i]
+            expected = self._trend(t, self.k[i], self.m[i], deltas)
+            shifts = np.zeros((per_iteration, len(t)))
+
+            if n_future and self.growth == 'linear':
+                likelihood = len(self.changepoints_t) * step
+                mean_delta = np.mean(np.abs(deltas)) + 1e-8
+                changes = rng.uniform(size=(per_iteration, n_future)) < likelihood
+                mat = rng.laplace(0, mean_delta, size=changes.shape) * changes
+                mat = (np.hstack([np.zeros((per_iteration, 1)), mat])[:, :-1] + mat) / 2
+                shifts[:, future] = mat.cumsum(axis=1).cumsum(axis=1) * step
+
+            trends = (expected + shifts) * self.y_scale + self.floor
+            beta = self.beta[i]
+            multiplicative = X @ (beta * self._multiplicative)
+            additive = X @ (beta * ~self._multiplicative) * self.y_scale
+            noise = rng.normal(0, self.sigma_obs[i], trends.shape) * self.y_scale
+            sims.append(trends * (1 + multiplicative) + additive + noise)
+
+        sims = np.vstack(sims)
+        lower_p = 100 * (1.0 - self.interval_width) / 2
+        upper_p = 100 * (1.0 + self.interval_width) / 2
+        return np.percentile(sims, lower_p, axis=0), np.percentile(sims, upper_p, axis=0)
+
+
+def is_artifact(path):
+    """True if a file starts with the compact artifact magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_artifact(path, model):
+    """
+    Write a forecaster in the compact format
+
+    Args:
+        path: Destination file
+        model: CompactProphet, fitted Prophet or SeasonalForecaster
+    """
+    if isinstance(model, SeasonalForecaster):
+        kind = 'seasonal'
+        state = {
+            'alpha': model.alpha,
+            'gamma': model.gamma,
+            'beta': model.beta,
+            'level': model.level,
+            'residual_var': model.residual_var,
+            'last_hour': None if model.last_hour is None else int(model.last_hour.astype(np.int64)),
+            'n_updates': model.n_updates,
+            'pending': [[int(hour.astype(np.int64)), total, count]
+                        for hour, (total, count) in sorted(model.pending.items())],
+        }
+        arrays = {'season': model.season}
+    else:
+        if not isinstance(model, CompactProphet):
+            model = CompactProphet.from_prophet(model)
+        kind = 'prophet'
+        state = {
+            'growth': model.growth,
+            'start': model.start.isoformat(),
+            't_scale': model.t_scale,
+            'y_scale': model.y_scale,
+            'floor': model.floor,
+            'last_ds': model.last_ds.isoformat(),
+            'history_step': model.history_step,
+            'interval_width': model.interval_width,
+            'uncertainty_samples': model.uncertainty_samples,
+            'seasonalities': model.seasonalities,
+        }
+        arrays = {
+            'k': model.k,
+            'm': model.m,
+            'delta': model.delta,
+            'beta': model.beta,
+            'sigma_obs': model.sigma_obs,
+            'changepoints_t': model.changepoints_t,
+        }
+
+    arrays = {name: np.ascontiguousarray(value, dtype='<f8') for name, value in arrays.items()}
+    header = json.dumps({
+        'kind': kind,
+        'state': state,
+        'arrays': [[name, list(value.shape)] for name, value in arrays.items()],
+    }).encode('utf-8')
+
+    # Write beside the destination and rename, so a reader (e.g. the
+    # backend's model registry) never loads a half-written artifact
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for value in arrays.values():
+            f.write(value.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path):
+    """
+    Read a compact artifact without unpickling anything
+
+    Returns:
+        CompactProphet or SeasonalForecaster
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, header_len = _PREAMBLE.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Not a forecast artifact: {path}")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Artifact format v{version} is newer than supported v{FORMAT_VERSION}")
+
+    offset = _PREAMBLE.size
+    header = json.loads(data[offset:offset + header_len].decode('utf-8'))
+    offset += header_len
+
+    arrays = {}
+    for name, shape in header['arrays']:
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(data, dtype='<f8', count=count, offset=offset).reshape(shape).copy()
+        offset += count * 8
+
+    state = header['state']
+    if header['kind'] == 'seasonal':
+        model = SeasonalForecaster(alpha=state['alpha'], gamma=state['gamma'], beta=state['beta'])
+        model.level = state['level']
+        model.residual_var = state['residual_var']
+        model.n_updates = state['n_updates']
+        if state['last_hour'] is not None:
+            model.last_hour = np.datetime64(state['last_hour'], 'h')
+        model.season = arrays['season']
+        # Artifacts written before online aggregation have no open hours
+        model.pending = {np.datetime64(hour, 'h'): [total, count] for hour, total, count in state.get('pending', [])}
+        return model
+
+    return CompactProphet(state, arrays)
@@ -0,0 +1,165 @@
+"""
+Hourly Productivity Sketch
+Running per-hour sums and counts that summarize a user's whole history in a
+fixed 192 buckets, so hourly insights cost the same at any history length
+"""
+import struct
+
+import numpy as np
+import pandas as pd
+
+try:
+    from models.seasonal_forecaster import HOURS_PER_WEEK, hour_of_week
+except ImportError:  # run as a script from ml/models
+    from seasonal_forecaster import HOURS_PER_WEEK, hour_of_week
+
+HOURS_PER_DAY = 24
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Serialized layout: version, half-life in days (0 = no decay), decay reference
+# time in epoch seconds, then hod_sum, hod_count, how_sum, how_count as float64
+SKETCH_VERSION = 1
+_HEADER = struct.Struct('<Hdq')
+
+
+class HourlySketch:
+    """
+    Sum/count of productivity scores per hour of day (24) and hour of week (168)
+
+    With a half-life, older observations are exponentially down-weighted:
+    the arrays are scaled down lazily whenever a newer observation arrives,
+    so every update is O(1) in the length of the history.
+    """
+
+    def __init__(self, half_life_days=None):
+        """
+        Args:
+            half_life_days: Age at which an observation counts half (None = no decay)
+        """
+        self.half_life_days = half_life_days or None
+        self.hod_sum = np.zeros(HOURS_PER_DAY)
+        self.hod_count = np.zeros(HOURS_PER_DAY)
+        self.how_sum = np.zeros(HOURS_PER_WEEK)
+        self.how_count = np.zeros(HOURS_PER_WEEK)
+        self.reference = None  # epoch seconds the weights are relative to
+
+    def add(self, timestamp, score):
+        """
+        Fold one scored activity into the sketch
+
+        Args:
+            timestamp: When the activity happened
+            score: Productivity score (None is ignored)
+        """
+        if score is None or pd.isna(score) or timestamp is None:
+            return self
+
+        timestamp = pd.Timestamp(timestamp)
+        seconds = int(timestamp.value // 10**9)
+        weight = self._weight(seconds)
+
+        hour = timestamp.hour
+        week_hour = timestamp.weekday() * HOURS_PER_DAY + hour  # same slots as hour_of_week
+
+        self.hod_sum[hour] += weight * score
+        self.hod_count[hour] += weight
+        self.how_sum[week_hour] += weight * score
+        self.how_count[week_hour] += weight
+        return self
+
+    def add_many(self, records):
+        """Fold an iterable of activity records (timestamp, productivity_score) in"""
+        for record in records:
+            self.add(record['timestamp'], record['productivity_score'])
+        return self
+
+    @classmethod
+    def from_frame(cls, df, half_life_days=None):
+        """
+        Build a sketch from an activity history in one vectorized pass
+
+        Args:
+            df: DataFrame with timestamp and productivity_score columns
+            half_life_days: See __init__
+        """
+        sketch = cls(half_life_days)
+        timestamps = pd.to_datetime(df['timestamp'])
+        scores = df['productivity_score'].to_numpy(dtype=float)
+        valid = ~(timestamps.isna().to_numpy() | np.isnan(scores))
+        if not valid.any():
+            return sketch
+
+        timestamps = timestamps[valid]
+        scores = scores[valid]
+        seconds = timestamps.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        sketch.reference = int(seconds.max())
+
+        if sketch.half_life_days:
+            weights = 0.5 ** ((sketch.reference - seconds) / (sketch.half_life_days * SECONDS_PER_DAY))
+        else:
+            weights = np.ones(len(scores))
+
+        hours = timestamps.dt.hour.to_numpy()
+        week_hours = hour_of_week(timestamps.to_numpy(dtype='datetime64[h]'))
+        sketch.hod_sum = np.bincount(hours, weights=weights * scores, minlength=HOURS_PER_DAY)
+        sketch.hod_count = np.bincount(hours, weights=weights, minlength=HOURS_PER_DAY)
+        sketch.how_sum = np.bincount(week_hours, weights=weights * scores, minlength=HOURS_PER_WEEK)
+        sketch.how_count = np.bincount(week_hours, weights=weights, minlength=HOURS_PER_WEEK)
+        return sketch
+
+    def hour_profile(self):
+        """(sums, counts) per hour of day, as PatternRecognizer.hour_profile returns"""
+        return self.hod_sum.copy(), self.hod_count.copy()
+
+    def week_profile(self):
+        """(sums, counts) per hour of week, Monday 00:00 first"""
+        return self.how_sum.copy(), self.how_count.copy()
+
+    def average(self):
+        """Weighted mean productivity over everything seen (NaN if empty)"""
+        total = self.hod_count.sum()
+        return float(self.hod_sum.sum() / total) if total > 0 else float('nan')
+
+    def to_bytes(self):
+        """Compact binary form (~3 KB)"""
+        header = _HEADER.pack(SKETCH_VERSION, self.half_life_days or 0.0,
+                              -1 if self.reference is None else self.reference)
+        arrays = np.concatenate([self.hod_sum, self.hod_count, self.how_sum, self.how_count])
+        return header + arrays.astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of to_bytes"""
+        version, half_life_days, reference = _HEADER.unpack_from(data)
+        if version > SKETCH_VERSION:
+            raise ValueError(f"Sketch format v{version} is newer than supported v{SKETCH_VERSION}")
+
+        sketch = cls(half_life_days or None)
+        sketch.reference = None if reference < 0 else reference
+        arrays = np.frombuffer(data, dtype='<f8', offset=_HEADER.size)
+        splits = np.cumsum([HOURS_PER_DAY, HOURS_PER_DAY, HOURS_PER_WEEK])
+        sketch.hod_sum, sketch.hod_count, sketch.how_sum, sketch.how_count = [
+            part.copy() for part in np.split(arrays, splits)
+        ]
+        return sketch
+
+    def _weight(self, seconds):
+        """Weight of an observation at `seconds`, rescaling the arrays if it is the newest"""
+        if self.reference is None:
+            self.reference = seconds
+            return 1.0
+        if not self.half_life_days:
+            self.reference = max(self.reference, seconds)
+            return 1.0
+
+        half_life = self.half_life_days * SECONDS_PER_DAY
+        if seconds > self.reference:
+            # Age everything already in the sketch up to the new reference time
+            factor = 0.5 ** ((seconds - self.reference) / half_life)
+            for array in (self.hod_sum, self.hod_count, self.how_sum, self.how_count):
+                array *= factor
+            self.reference = seconds
+            return 1.0
+
+        # Backfilled observation: weigh it by its age
+        return 0.5 ** ((self.reference - seconds) / half_life)
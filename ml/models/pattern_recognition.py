@@ -4,39 +4,111 @@ Identifies user behavior patterns (Morning Person, Night Owl, etc.)
 """
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 import joblib
 import os
 
+try:
+    from models.hourly_sketch import HourlySketch
+    from models.features import prepare_features
+except ImportError:  # run as a script from ml/models
+    from hourly_sketch import HourlySketch
+    from features import prepare_features
+
+# Users with fewer scored activities don't have a meaningful hourly profile
+MIN_PROFILE_ACTIVITIES = 10
+
+# Hours before this belong to the night before when placing a centroid's peak
+DAY_STARTS_AT = 4
+
+# Weights of an hour and its neighbours when smoothing a profile; schedules
+# a few minutes apart otherwise land in different hours and split clusters
+SHAPE_SMOOTHING = (1.0, 2.0, 1.0)
+
+# Feature layouts: 'shape' profiles are clustered by default; models saved
+# before it existed were fitted on raw hourly averages and keep using them
+FEATURE_KINDS = ('shape', 'average')
+
 class PatternRecognizer:
+    # Activity columns hour profiles are built from
+    COLUMNS = ['timestamp', 'productivity_score']
+    
     def __init__(self, n_clusters=3):
         self.n_clusters = n_clusters
-        self.model = KMeans(n_clusters=n_clusters, random_state=42)
+        self.model = self._new_model()
         self.scaler = StandardScaler()
+        self.feature_kind = 'shape'
         self.labels = {
             0: "Morning Person",
             1: "Night Owl",
             2: "Consistent Worker"
         }
+    
+    def _new_model(self, init='k-means++'):
+        return MiniBatchKMeans(n_clusters=self.n_clusters, init=init, random_state=42,
+                               n_init=1 if isinstance(init, np.ndarray) else 3)
         
-    def prepare_features(self, df):
-        """Prepare hourly productivity features"""
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    def hour_profile(self, df):
+        """
+        Per-hour productivity sums and counts in a single pass
         
-        # Group by hour of day and get average productivity
-        hourly_avg = df.groupby(df['timestamp'].dt.hour)['productivity_score'].mean()
+        Args:
+            df: DataFrame with timestamp and productivity_score columns (or
+                a frame from features.prepare_features)
+            
+        Returns:
+            (sums, counts) arrays of length 24, indexed by hour of day
+        """
+        hours = prepare_features(df)['hour'].to_numpy()
+        scores = df['productivity_score'].to_numpy(dtype=float)
+        valid = ~(np.isnan(hours) | np.isnan(scores))
         
-        # Create 24-hour feature vector
-        features = np.zeros(24)
-        for hour, score in hourly_avg.items():
-            features[hour] = score
+        hours = hours[valid].astype(np.intp)
+        sums = np.bincount(hours, weights=scores[valid], minlength=24)
+        counts = np.bincount(hours, minlength=24).astype(float)
+        return sums, counts
+    
+    @staticmethod
+    def profile_features(sums, counts):
+        """Average productivity per hour (0 for hours without activity)"""
+        return np.divide(sums, counts, out=np.zeros(24), where=counts > 0)
+    
+    @staticmethod
+    def profile_shape(sums, counts):
+        """
+        Shape of a user's day: smoothed hourly average minus their overall average
         
+        Hours without activity sit at 0 (the user's average), so users are
+        compared by when they do their best and worst work rather than by
+        their overall level or exactly which hours they log.
+        """
+        total = counts.sum()
+        if total == 0:
+            return np.zeros(24)
+        mean = sums.sum() / total
+        
+        smoothed_sums, smoothed_counts = np.zeros(24), np.zeros(24)
+        for offset, weight in zip((-1, 0, 1), SHAPE_SMOOTHING):
+            smoothed_sums += weight * np.roll(sums, offset)
+            smoothed_counts += weight * np.roll(counts, offset)
+        averages = np.divide(smoothed_sums, smoothed_counts, out=np.full(24, mean), where=smoothed_counts > 0)
+        return averages - mean
+    
+    def cluster_features(self, sums, counts):
+        """Clustering features of one hourly profile, in the layout the model was fitted on"""
+        if self.feature_kind == 'average':
+            return self.profile_features(sums, counts)
+        return self.profile_shape(sums, counts)
+    
+    def prepare_features(self, df):
+        """Prepare hourly productivity features"""
+        features = self.cluster_features(*self.hour_profile(df))
         return features.reshape(1, -1)
     
     def train(self, data_path):
         """
-        Train on demo data (simulating multiple user patterns)
+        Train on the users in an activity CSV
         
         Args:
             data_path: Path to CSV with activity data
@@ -44,75 +116,252 @@ class PatternRecognizer:
         print("🎓 Training Pattern Recognizer...")
         
         df = pd.read_csv(data_path)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        self.fit_frame(df)
+    
+    def fit_frame(self, df):
+        """
+        Train on an activity DataFrame holding one or more users
         
-        # Create synthetic users by shifting hours
-        all_features = []
+        Args:
+            df: DataFrame with activity data (user_id column optional)
+        """
+        if 'user_id' in df:
+            frames_by_user = dict(tuple(df.groupby('user_id')))
+        else:
+            frames_by_user = {None: df}
+        self.fit_frames(frames_by_user)
+    
+    def fit_frames(self, frames_by_user):
+        """
+        Fit from scratch on real per-user hour profiles
+        
+        The scaler is fitted once on the whole population and the centroids
+        come from a full KMeans fit; they seed the MiniBatchKMeans that
+        partial_fit refreshes later. With fewer usable users than clusters
+        (e.g. the single-user demo data) the model is seeded from synthetic
+        archetypes instead.
+        
+        Args:
+            frames_by_user: Dict of user_id -> activity DataFrame
+        """
+        self.feature_kind = 'shape'
+        profiles = self.user_profiles(frames_by_user)
+        if len(profiles) < self.n_clusters:
+            print(f"⚠️  Only {len(profiles)} usable users, seeding from synthetic patterns")
+            frame = next(iter(frames_by_user.values()))
+            profiles = self.synthetic_profiles(frame)
         
-        # Original pattern (morning person)
-        features = self.prepare_features(df)
-        all_features.append(features[0])
+        self.scaler = StandardScaler().fit(profiles)
+        scaled = self.scaler.transform(profiles)
+        seed = KMeans(n_clusters=self.n_clusters, random_state=42, n_init=10).fit(scaled)
         
-        # Shift +8 hours (night owl simulation)
-        df_shifted = df.copy()
-        df_shifted['timestamp'] = df_shifted['timestamp'] + pd.Timedelta(hours=8)
-        features_night = self.prepare_features(df_shifted)
-        all_features.append(features_night[0])
+        # Starting from converged centroids, this step only records the
+        # cluster sizes that weigh later partial_fit updates
+        self.model = self._new_model(init=seed.cluster_centers_)
+        self.model.partial_fit(scaled)
+        self.labels = self.label_centroids()
+        
+        print(f"✅ Pattern model trained with {len(profiles)} patterns")
+    
+    def partial_fit(self, profiles, is_new=None):
+        """
+        Refresh the centroids with the hour profiles of users whose data changed
+        
+        Cheap enough to run on just those users, so the model can be
+        refreshed without refitting the whole population. Only users the
+        scaler has never seen update its statistics (the others are already
+        counted); when they do, the centroids are re-projected into the new
+        scaled space before moving.
+        
+        Args:
+            profiles: Array of shape (n_users, 24), see cluster_features
+            is_new: Boolean mask of users not seen by earlier fits (default: none)
+        """
+        profiles = np.asarray(profiles, dtype=float)
+        new_profiles = profiles[np.asarray(is_new, dtype=bool)] if is_new is not None else profiles[:0]
+        
+        if len(new_profiles):
+            centroids = self.scaler.inverse_transform(self.model.cluster_centers_)
+            self.scaler.partial_fit(new_profiles)
+            self.model.cluster_centers_ = self.scaler.transform(centroids)
+        
+        self.model.partial_fit(self.scaler.transform(profiles))
+        self.labels = self.label_centroids()
+        return self
+    
+    def can_refresh(self):
+        """True if the model is fitted and supports incremental updates"""
+        return hasattr(self.model, 'partial_fit') and hasattr(self.model, 'cluster_centers_')
+    
+    def user_profiles(self, frames_by_user):
+        """Hour profile features of every user with enough scored activity"""
+        profiles = []
+        for frame in frames_by_user.values():
+            sums, counts = self.hour_profile(frame)
+            if counts.sum() >= MIN_PROFILE_ACTIVITIES:
+                profiles.append(self.cluster_features(sums, counts))
+        return np.array(profiles).reshape(-1, 24)
+    
+    def synthetic_profiles(self, df):
+        """Morning, night-owl and flat profiles derived from one user's history"""
+        sums, counts = self.hour_profile(df)
+        
+        # Shift +8 hours (night owl simulation): hour h moves to h + 8
+        shifted_sums, shifted_counts = np.roll(sums, 8), np.roll(counts, 8)
         
         # Consistent worker (flatten the pattern)
-        df_consistent = df.copy()
-        df_consistent['productivity_score'] = df_consistent['productivity_score'].mean()
-        features_consistent = self.prepare_features(df_consistent)
-        all_features.append(features_consistent[0])
+        consistent_sums = counts * df['productivity_score'].mean()
+        
+        return np.vstack([
+            self.cluster_features(sums, counts),
+            self.cluster_features(shifted_sums, shifted_counts),
+            self.cluster_features(consistent_sums, counts),
+        ])
+    
+    def label_centroids(self):
+        """
+        Name each cluster from the shape of its centroid profile
+        
+        Labels are handed out by ranking the centroids rather than by fixed
+        thresholds, so every label is used once: the flattest centroid is
+        the Consistent Worker, and of the rest the one whose above-average
+        hours come earliest is the Morning Person and the latest the Night
+        Owl. Any further clusters take whichever of those two they are
+        closer to.
+        """
+        centroids = self.scaler.inverse_transform(self.model.cluster_centers_)
+        spreads = np.array([self._spread(profile) for profile in centroids])
+        timings = np.array([self._peak_time(profile) for profile in centroids])
+        
+        labels = {}
+        remaining = list(range(len(centroids)))
+        if len(remaining) >= 3:
+            consistent = int(np.argmin(spreads))
+            labels[consistent] = "Consistent Worker"
+            remaining.remove(consistent)
         
-        X = np.array(all_features)
-        X_scaled = self.scaler.fit_transform(X)
-        self.model.fit(X_scaled)
+        remaining.sort(key=lambda cluster: timings[cluster])
+        earliest, latest = timings[remaining[0]], timings[remaining[-1]]
+        for cluster in remaining:
+            if cluster == remaining[0]:
+                labels[cluster] = "Morning Person"
+            elif cluster == remaining[-1]:
+                labels[cluster] = "Night Owl"
+            else:
+                closer_to_morning = timings[cluster] - earliest <= latest - timings[cluster]
+                labels[cluster] = "Morning Person" if closer_to_morning else "Night Owl"
         
-        print(f"✅ Pattern model trained with {len(all_features)} patterns")
+        return labels
+    
+    def _spread(self, profile):
+        """How far a centroid's hours stray from its average"""
+        if self.feature_kind == 'average':
+            active = profile[profile > 0.5]
+            return float(active.std()) if len(active) else 0.0
+        return float(profile.std())
+    
+    def _peak_time(self, profile):
+        """Clock hour (from DAY_STARTS_AT, so 1am is 25) at the centre of a centroid's above-average hours"""
+        clock = np.where(np.arange(24) < DAY_STARTS_AT, np.arange(24) + 24, np.arange(24))
+        if self.feature_kind == 'average':
+            active = profile > 0.5
+            if not active.any():
+                return 12.0
+            profile = np.where(active, profile - profile[active].mean(), 0)
+        excess = np.maximum(profile, 0)
+        if excess.sum() == 0:
+            return 12.0
+        return float((excess * clock).sum() / excess.sum())
         
-    def predict_pattern(self, df):
+    def predict_pattern(self, df=None, sketch=None):
         """
         Predict user's productivity pattern
         
         Args:
             df: DataFrame with user activity data
+            sketch: HourlySketch of the user's history, used instead of df
+                (constant cost regardless of history length)
             
         Returns:
             Dictionary with pattern analysis
         """
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Prepare features
-        features = self.prepare_features(df)
+        # Build the hourly profile once; features, peaks and lows all come from it
+        source = sketch if sketch is not None else df
+        sums, counts = self._profile(source)
+        features = self.cluster_features(sums, counts).reshape(1, -1)
         features_scaled = self.scaler.transform(features)
         
         # Predict cluster
         cluster = self.model.predict(features_scaled)[0]
         
-        # Get peak and low energy hours
-        hourly_avg = df.groupby(df['timestamp'].dt.hour)['productivity_score'].mean()
-        peak_hours = hourly_avg.nlargest(3).index.tolist()
-        low_hours = hourly_avg.nsmallest(3).index.tolist()
+        return self._build_result(cluster, sums, counts, self._average(source))
+    
+    def predict_patterns(self, frames_by_user):
+        """
+        Predict patterns for many users with one scaler transform and one KMeans predict
+        
+        Args:
+            frames_by_user: Dict of user_id -> activity DataFrame or HourlySketch
+            
+        Returns:
+            Dict of user_id -> pattern analysis (same shape as predict_pattern)
+        """
+        user_ids = list(frames_by_user)
+        if not user_ids:
+            return {}
+        
+        profiles = [self._profile(frames_by_user[user_id]) for user_id in user_ids]
+        features = np.vstack([self.cluster_features(sums, counts) for sums, counts in profiles])
+        clusters = self.model.predict(self.scaler.transform(features))
+        
+        return {
+            user_id: self._build_result(cluster, sums, counts, self._average(frames_by_user[user_id]))
+            for user_id, cluster, (sums, counts) in zip(user_ids, clusters, profiles)
+        }
+    
+    def _profile(self, source):
+        """Hourly (sums, counts) of an activity DataFrame or HourlySketch"""
+        if isinstance(source, HourlySketch):
+            return source.hour_profile()
+        return self.hour_profile(source)
+    
+    @staticmethod
+    def _average(source):
+        """Mean productivity of an activity DataFrame or HourlySketch"""
+        if isinstance(source, HourlySketch):
+            return source.average()
+        return float(source['productivity_score'].mean())
+    
+    def _build_result(self, cluster, sums, counts, avg_productivity):
+        """Pattern analysis for one user from their hourly profile"""
+        # Hours with activity, ties broken by earliest hour like nlargest/nsmallest
+        active = np.flatnonzero(counts > 0)
+        hourly_avg = sums[active] / counts[active]
+        peak_hours = active[np.argsort(-hourly_avg, kind='stable')[:3]]
+        low_hours = active[np.argsort(hourly_avg, kind='stable')[:3]]
         
+        # None rather than NaN when nothing was scored: NaN isn't valid JSON
         return {
             'pattern_type': self.labels.get(cluster, "Unknown"),
             'cluster_id': int(cluster),
             'peak_hours': [int(h) for h in peak_hours],
             'low_energy_hours': [int(h) for h in low_hours],
-            'avg_productivity': float(df['productivity_score'].mean()),
-            'peak_productivity': float(hourly_avg.max()),
-            'low_productivity': float(hourly_avg.min())
+            'avg_productivity': None if np.isnan(avg_productivity) else avg_productivity,
+            'peak_productivity': float(hourly_avg.max()) if len(active) else None,
+            'low_productivity': float(hourly_avg.min()) if len(active) else None
         }
     
     def save_model(self, path):
         """Save model and scaler"""
         os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Through a temporary file, so a running backend never loads half of it
         joblib.dump({
             'model': self.model,
             'scaler': self.scaler,
-            'labels': self.labels
-        }, path)
+            'labels': self.labels,
+            'features': self.feature_kind
+        }, path + '.tmp')
+        os.replace(path + '.tmp', path)
         print(f"💾 Pattern model saved to {path}")
     
     def load_model(self, path):
@@ -121,6 +370,7 @@ class PatternRecognizer:
         self.model = data['model']
         self.scaler = data['scaler']
         self.labels = data['labels']
+        self.feature_kind = data.get('features', 'average')
         print(f"�� Pattern model loaded from {path}")
 
 
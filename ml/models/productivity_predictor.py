@@ -2,38 +2,70 @@
 Productivity Predictor using Prophet for time-series forecasting
 Predicts user productivity 24 hours in advance
 """
-from prophet import Prophet
 import pandas as pd
 import numpy as np
 import joblib
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 
+try:
+    from models.seasonal_forecaster import SeasonalForecaster
+    from models.forecast_artifact import CompactProphet, is_artifact, load_artifact, save_artifact
+    from models.features import prepare_features
+except ImportError:  # run as a script from ml/models
+    from seasonal_forecaster import SeasonalForecaster
+    from forecast_artifact import CompactProphet, is_artifact, load_artifact, save_artifact
+    from features import prepare_features
+
+# Selectable forecasting backends
+FORECASTERS = ('prophet', 'seasonal')
+
 class ProductivityPredictor:
     """
-    Predicts productivity scores using Facebook Prophet
+    Predicts productivity scores using Facebook Prophet, or the online
+    SeasonalForecaster when forecaster='seasonal'
     """
+    # Activity columns the predictor reads (see ActivityStore column projection)
+    COLUMNS = ['timestamp', 'productivity_score']
     
-    def __init__(self):
+    
+    def __init__(self, forecaster='prophet'):
+        if forecaster not in FORECASTERS:
+            raise ValueError(f"Unknown forecaster '{forecaster}', expected one of {FORECASTERS}")
+        
+        self.forecaster = forecaster
         self.model = None
         self.trained = False
         
+        # Forecasts only change when the model does; memoize them per
+        # (model_version, periods) for the current hour
+        self.model_version = 0
+        self._forecast_cache = {}
+        self._forecast_hour = None
+        
+        # Online updates and forecasts may run on different request threads
+        self._lock = threading.RLock()
+        
     def prepare_data(self, df):
         """
         Prepare activity data for Prophet training
         
         Args:
-            df: DataFrame with columns [timestamp, productivity_score]
+            df: DataFrame with columns [timestamp, productivity_score], or a
+                frame from features.prepare_features (df is never modified)
             
         Returns:
             DataFrame with columns [ds, y] required by Prophet
         """
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = prepare_features(df)
         
         # Prophet requires columns named 'ds' (datetime) and 'y' (value to predict)
-        prophet_df = df[['timestamp', 'productivity_score']].copy()
-        prophet_df.columns = ['ds', 'y']
+        prophet_df = pd.DataFrame({
+            'ds': df['timestamp'].values,
+            'y': df['productivity_score'].values
+        })
         
         # Remove any rows with missing values
         prophet_df = prophet_df.dropna()
@@ -50,6 +82,27 @@ class ProductivityPredictor:
         
         return prophet_df
     
+    def prepare_rollup(self, hourly_rollup):
+        """
+        Prepare a pre-aggregated hourly rollup for Prophet training
+        
+        Args:
+            hourly_rollup: DataFrame with one row per hour and columns
+                [bucket, score_count, productivity_sum] (the activity_hourly table)
+            
+        Returns:
+            DataFrame with columns [ds, y] required by Prophet
+        """
+        scored = hourly_rollup[hourly_rollup['score_count'] > 0]
+        prophet_df = pd.DataFrame({
+            'ds': pd.to_datetime(scored['bucket'].values),
+            'y': scored['productivity_sum'].values / scored['score_count'].values
+        }).sort_values('ds').reset_index(drop=True)
+        
+        print(f"📊 Prepared {len(prophet_df)} hourly data points for training")
+        
+        return prophet_df
+    
     def train(self, data_path):
         """
         Train the Prophet model on historical activity data
@@ -70,6 +123,53 @@ class ProductivityPredictor:
         # Prepare data for Prophet
         prophet_df = self.prepare_data(df)
         
+        return self.fit(prophet_df)
+    
+    def train_from_rollup(self, hourly_rollup):
+        """
+        Train the Prophet model on an hourly rollup
+        
+        Args:
+            hourly_rollup: DataFrame in activity_hourly layout (see prepare_rollup)
+        """
+        print(f"🎓 Training Productivity Predictor from hourly rollup...")
+        return self.fit(self.prepare_rollup(hourly_rollup))
+    
+    def train_from_store(self, store, user_id=None):
+        """
+        Train on history in a columnar ActivityStore, reading only COLUMNS
+        
+        Args:
+            store: models.activity_store.ActivityStore
+            user_id: User to train on (default: everyone in the store)
+        """
+        print(f"🎓 Training Productivity Predictor from activity store...")
+        if user_id is None:
+            df = store.read_users(columns=self.COLUMNS)
+        else:
+            df = store.read_user(user_id, columns=self.COLUMNS)
+        if df is None or len(df) == 0:
+            raise ValueError(f"No stored activity for user {user_id}")
+        return self.fit(self.prepare_data(df))
+    
+    def fit(self, prophet_df):
+        """
+        Fit the forecaster on prepared hourly data
+        
+        Args:
+            prophet_df: DataFrame with columns [ds, y]
+        """
+        if self.forecaster == 'seasonal':
+            print("🤖 Training seasonal forecaster...")
+            self.model = SeasonalForecaster().fit(prophet_df)
+            self.trained = True
+            self._model_changed()
+            print("✅ Model training complete!")
+            return self
+        
+        # Prophet needs Stan; only import it when it is actually used
+        from prophet import Prophet
+        
         # Initialize and configure Prophet
         self.model = Prophet(
             daily_seasonality=True,
@@ -85,6 +185,7 @@ class ProductivityPredictor:
         self.model.fit(prophet_df)
         
         self.trained = True
+        self._model_changed()
         print("✅ Model training complete!")
         
         return self
@@ -102,14 +203,26 @@ class ProductivityPredictor:
         if not self.trained or self.model is None:
             raise Exception("Model must be trained before making predictions!")
         
-        # Create future dataframe for predictions
-        future = self.model.make_future_dataframe(periods=periods, freq='H')
+        with self._lock:
+            return self._predict(periods)
+    
+    def _predict(self, periods):
+        """predict() with the lock held"""
+        # Serve from the memo while the model and hour are unchanged
+        hour_bucket = int(time.time() // 3600)
+        if hour_bucket != self._forecast_hour:
+            self._forecast_cache.clear()
+            self._forecast_hour = hour_bucket
+        
+        cache_key = (self.model_version, periods)
+        cached = self._forecast_cache.get(cache_key)
+        if cached is not None:
+            return cached.copy()
         
-        # Make predictions
+        # Forecast only the future hours - history is never re-predicted
+        future = self.future_dataframe(periods)
         forecast = self.model.predict(future)
-        
-        # Get only the future predictions (not historical)
-        predictions = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(periods)
+        predictions = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
         
         # Rename columns for clarity
         predictions.columns = ['timestamp', 'predicted_score', 'lower_bound', 'upper_bound']
@@ -128,12 +241,69 @@ class ProductivityPredictor:
         )
         predictions['confidence'] = predictions['confidence'].clip(0, 1)
         
-        return predictions
+        self._forecast_cache[cache_key] = predictions
+        return predictions.copy()
+    
+    def future_dataframe(self, periods):
+        """
+        Hourly timestamps following the training history
+        
+        Same dates as Prophet's make_future_dataframe(include_history=False),
+        without copying the history first.
+        
+        Args:
+            periods: Number of hours
+            
+        Returns:
+            DataFrame with a single 'ds' column
+        """
+        if self.forecaster == 'seasonal':
+            last_date = pd.Timestamp(self.model.last_hour)
+        elif isinstance(self.model, CompactProphet):
+            last_date = self.model.last_ds
+        else:
+            last_date = self.model.history_dates.max()
+        dates = pd.date_range(start=last_date, periods=periods + 1, freq='H')
+        return pd.DataFrame({'ds': dates[dates > last_date][:periods]})
+    
+    def update(self, timestamp, score):
+        """
+        Record a newly logged activity
+        
+        Only the seasonal forecaster learns online: like training, it folds
+        in one mean score per hour, once the hour is complete (see
+        SeasonalForecaster.observe). Prophet models are static until
+        retrained, so this is a no-op for them.
+        
+        Args:
+            timestamp: When the activity happened
+            score: Productivity score
+            
+        Returns:
+            True if the model recorded it (save it to keep the update)
+        """
+        if self.forecaster != 'seasonal' or not self.trained:
+            return False
+        
+        with self._lock:
+            if not self.model.observe(timestamp, score):
+                return False
+            self._model_changed()
+        return True
+    
+    def _model_changed(self):
+        """Invalidate memoized forecasts after the model is (re)trained or loaded"""
+        self.model_version += 1
+        self._forecast_cache.clear()
     
     def save_model(self, path):
         """
         Save the trained model to disk
         
+        Writes the compact forecast artifact (fitted parameters only, see
+        forecast_artifact.py). Prophet configurations it cannot represent
+        are pickled whole as before.
+        
         Args:
             path: Path where model should be saved
         """
@@ -143,8 +313,14 @@ class ProductivityPredictor:
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(path), exist_ok=True)
         
-        # Save the model
-        joblib.dump(self.model, path)
+        # Save the model (locked, so an online update can't land mid-write)
+        try:
+            with self._lock:
+                save_artifact(path, self.model)
+        except ValueError as e:
+            print(f"⚠️  Compact format unavailable ({e}), pickling model")
+            joblib.dump(self.model, path + '.tmp')
+            os.replace(path + '.tmp', path)
         print(f"💾 Model saved to: {path}")
     
     def load_model(self, path):
@@ -157,8 +333,14 @@ class ProductivityPredictor:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Model file not found: {path}")
         
-        self.model = joblib.load(path)
+        # Compact artifacts load without unpickling; older pickles still work
+        if is_artifact(path):
+            self.model = load_artifact(path)
+        else:
+            self.model = joblib.load(path)
+        self.forecaster = 'seasonal' if isinstance(self.model, SeasonalForecaster) else 'prophet'
         self.trained = True
+        self._model_changed()
         print(f"📂 Model loaded from: {path}")
         
         return self
@@ -1,153 +1,265 @@
-
 """
 Recommendation Engine
 Combines all ML models to generate personalized recommendations
 """
+import heapq
 import pandas as pd
 import numpy as np
+from collections import namedtuple
 from datetime import datetime
 import os
 
+try:
+    from models.features import prepare_features
+except ImportError:  # run as a script from ml/models
+    from features import prepare_features
+
+PRIORITY_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+# A recommendation rule: `build(features)` returns a recommendation, a list of
+# them, or None; it only runs when every feature in `requires` is present
+Rule = namedtuple('Rule', ['name', 'requires', 'build'])
+
+# Registered rules, in the order their recommendations are listed within a priority
+RULES = []
+
+
+def rule(name, requires=()):
+    """Register a recommendation rule (see Rule)"""
+    def register(build):
+        RULES.append(Rule(name, tuple(requires), build))
+        return build
+    return register
+
+
+@rule('peak_hour', requires=['peak_hour'])
+def schedule_deep_work(f):
+    return {
+        'type': 'timing',
+        'priority': 'high',
+        'icon': '🎯',
+        'title': 'Schedule Your Most Important Task',
+        'message': f"Your productivity peaks at {f['peak_hour']}:00 with a predicted score of {f['peak_score']:.1f}/10. Schedule deep work then!",
+        'action': 'schedule_deep_work',
+        'data': {'hour': f['peak_hour'], 'score': f['peak_score']}
+    }
+
+
+@rule('low_hour', requires=['low_hour'])
+def schedule_light_work(f):
+    if f['low_score'] >= 6:
+        return None
+    return {
+        'type': 'timing',
+        'priority': 'medium',
+        'icon': '📅',
+        'title': 'Avoid Deep Work During Low Energy',
+        'message': f"Your energy dips at {f['low_hour']}:00. Schedule meetings or light tasks then.",
+        'action': 'schedule_light_work',
+        'data': {'hour': f['low_hour']}
+    }
+
+
+@rule('morning_person', requires=['pattern'])
+def morning_person(f):
+    pattern = f['pattern']
+    if pattern['pattern_type'] != 'Morning Person':
+        return None
+    return {
+        'type': 'pattern',
+        'priority': 'high',
+        'icon': '🌅',
+        'title': "You're a Morning Person!",
+        'message': f"Your peak hours are {pattern['peak_hours']}. Block these for creative work.",
+        'action': 'block_peak_hours',
+        'data': pattern
+    }
+
+
+@rule('night_owl', requires=['pattern'])
+def night_owl(f):
+    pattern = f['pattern']
+    if pattern['pattern_type'] != 'Night Owl':
+        return None
+    return {
+        'type': 'pattern',
+        'priority': 'high',
+        'icon': '🌙',
+        'title': "You're a Night Owl!",
+        'message': f"You work best in the evening. Consider flexible hours.",
+        'data': pattern
+    }
+
+
+@rule('burnout_risk', requires=['anomaly'])
+def burnout_risk(f):
+    anomaly = f['anomaly']
+    if not (anomaly['is_anomaly'] and anomaly['risk_level'] in ['critical', 'high']):
+        return None
+    return {
+        'type': 'health',
+        'priority': 'critical',
+        'icon': '🚨',
+        'title': 'Burnout Risk Detected!',
+        'message': 'Take a break today. Your wellbeing matters more than work.',
+        'action': 'take_day_off',
+        'data': anomaly
+    }
+
+
+@rule('severe_alerts', requires=['anomaly'])
+def severe_alerts(f):
+    return [
+        {
+            'type': 'health',
+            'priority': 'high',
+            'icon': '⚠️',
+            'title': alert['type'].replace('_', ' ').title(),
+            'message': alert['message'],
+            'action': f"fix_{alert['type']}",
+            'data': alert
+        }
+        for alert in f['anomaly'].get('alerts', [])
+        if alert['severity'] == 'high'
+    ]
+
+
+@rule('take_break', requires=['work_today'])
+def take_break(f):
+    if not (f['work_today'] > 2 and f['breaks_today'] < 2):
+        return None
+    return {
+        'type': 'break',
+        'priority': 'medium',
+        'icon': '☕',
+        'title': 'Time for a Break',
+        'message': f"You've worked {f['work_today']:.1f} hours with only {f['breaks_today']} breaks. Take a 5-10 minute break!",
+        'action': 'take_break',
+        'data': {'work_hours': f['work_today'], 'breaks': f['breaks_today']}
+    }
+
+
+@rule('great_day', requires=['avg_today'])
+def great_day(f):
+    if not f['avg_today'] > 7:
+        return None
+    return {
+        'type': 'encouragement',
+        'priority': 'low',
+        'icon': '🎉',
+        'title': 'Great Work Today!',
+        'message': f"Your productivity is {f['avg_today']:.1f}/10 - above your average! Keep it up!",
+        'action': 'celebrate',
+        'data': {'score': f['avg_today']}
+    }
+
+
 class RecommendationEngine:
-    def __init__(self, predictor=None, pattern_recognizer=None, anomaly_detector=None):
+    def __init__(self, predictor=None, pattern_recognizer=None, anomaly_detector=None, rules=None):
         self.predictor = predictor
         self.pattern_recognizer = pattern_recognizer
         self.anomaly_detector = anomaly_detector
+        
+        # Freeze the registry so rules registered later don't change a live engine
+        self.rules = tuple(RULES if rules is None else rules)
     
-    def generate_recommendations(self, user_data, predictions=None, pattern=None, anomaly=None):
+    def generate_recommendations(self, user_data, predictions=None, pattern=None, anomaly=None,
+                                 today=None, k=None):
         """
         Generate personalized recommendations
         
         Args:
-            user_data: DataFrame with user's recent activity data
+            user_data: DataFrame with user's recent activity data (not modified)
             predictions: Predictions from ProductivityPredictor (optional)
             pattern: Pattern analysis from PatternRecognizer (optional)
             anomaly: Anomaly detection from AnomalyDetector (optional)
+            today: Latest day's total_work_hours, break_count and
+                avg_productivity, e.g. from the daily rollup (optional;
+                computed from user_data otherwise)
+            k: Only return the k most important recommendations
             
         Returns:
             List of recommendation dictionaries
         """
-        recommendations = []
+        features = self.build_features(user_data, predictions, pattern, anomaly, today)
+        return self.recommend(features, k=k)
+    
+    def build_features(self, user_data, predictions=None, pattern=None, anomaly=None, today=None):
+        """
+        Reduce the model outputs and activity history to the flat feature dict rules read
+        
+        Returns:
+            Dict with peak/low forecast hours and scores, pattern, anomaly
+            and today's work hours, breaks and average productivity
+        """
+        features = {'pattern': pattern, 'anomaly': anomaly}
         
-        # 1. Recommendations from Predictions
         if predictions is not None and len(predictions) > 0:
-            # Find peak productivity hour
-            peak_hour_idx = predictions['predicted_score'].idxmax()
-            peak_hour = predictions.loc[peak_hour_idx]
-            
-            recommendations.append({
-                'type': 'timing',
-                'priority': 'high',
-                'icon': '🎯',
-                'title': 'Schedule Your Most Important Task',
-                'message': f"Your productivity peaks at {int(peak_hour['hour'])}:00 with a predicted score of {peak_hour['predicted_score']:.1f}/10. Schedule deep work then!",
-                'action': 'schedule_deep_work',
-                'data': {'hour': int(peak_hour['hour']), 'score': float(peak_hour['predicted_score'])}
+            scores = predictions['predicted_score'].to_numpy()
+            hours = predictions['hour'].to_numpy()
+            peak, low = int(np.argmax(scores)), int(np.argmin(scores))
+            features.update({
+                'peak_hour': int(hours[peak]),
+                'peak_score': float(scores[peak]),
+                'low_hour': int(hours[low]),
+                'low_score': float(scores[low]),
             })
-            
-            # Find low productivity hours
-            low_hour_idx = predictions['predicted_score'].idxmin()
-            low_hour = predictions.loc[low_hour_idx]
-            
-            if low_hour['predicted_score'] < 6:
-                recommendations.append({
-                    'type': 'timing',
-                    'priority': 'medium',
-                    'icon': '📅',
-                    'title': 'Avoid Deep Work During Low Energy',
-                    'message': f"Your energy dips at {int(low_hour['hour'])}:00. Schedule meetings or light tasks then.",
-                    'action': 'schedule_light_work',
-                    'data': {'hour': int(low_hour['hour'])}
-                })
         
-        # 2. Recommendations from Pattern Recognition
-        if pattern is not None:
-            if pattern['pattern_type'] == 'Morning Person':
-                recommendations.append({
-                    'type': 'pattern',
-                    'priority': 'high',
-                    'icon': '🌅',
-                    'title': "You're a Morning Person!",
-                    'message': f"Your peak hours are {pattern['peak_hours']}. Block these for creative work.",
-                    'action': 'block_peak_hours',
-                    'data': pattern
-                })
-            elif pattern['pattern_type'] == 'Night Owl':
-                recommendations.append({
-                    'type': 'pattern',
-                    'priority': 'high',
-                    'icon': '🌙',
-                    'title': "You're a Night Owl!",
-                    'message': f"You work best in the evening. Consider flexible hours.",
-                    'data': pattern
-                })
+        if today is None and user_data is not None and len(user_data) > 0:
+            today = self.latest_day(user_data)
+        if today is not None:
+            features.update({
+                'work_today': float(today['total_work_hours']),
+                'breaks_today': int(today['break_count']),
+                'avg_today': float(today['avg_productivity']),
+            })
         
-        # 3. Recommendations from Anomaly Detection
-        if anomaly is not None:
-            if anomaly['is_anomaly']:
-                if anomaly['risk_level'] in ['critical', 'high']:
-                    recommendations.append({
-                        'type': 'health',
-                        'priority': 'critical',
-                        'icon': '🚨',
-                        'title': 'Burnout Risk Detected!',
-                        'message': 'Take a break today. Your wellbeing matters more than work.',
-                        'action': 'take_day_off',
-                        'data': anomaly
-                    })
-            
-            # Specific alerts
-            for alert in anomaly.get('alerts', []):
-                if alert['severity'] == 'high':
-                    recommendations.append({
-                        'type': 'health',
-                        'priority': 'high',
-                        'icon': '⚠️',
-                        'title': alert['type'].replace('_', ' ').title(),
-                        'message': alert['message'],
-                        'action': f"fix_{alert['type']}",
-                        'data': alert
-                    })
+        return features
+    
+    @staticmethod
+    def latest_day(user_data):
+        """Work hours, breaks and average productivity on the user's most recent day"""
+        features = prepare_features(user_data)
+        days = features['date'].to_numpy()
+        latest = days == days.max()
+        
+        return {
+            'total_work_hours': features['duration'][latest & features['is_work'].to_numpy()].sum() / 60,
+            'break_count': int((latest & features['is_break'].to_numpy()).sum()),
+            'avg_productivity': features['productivity_score'][latest].mean(),
+        }
+    
+    def recommend(self, features, k=None):
+        """
+        Run every rule against a feature dict and rank the results
         
-        # 4. General Recommendations
-        if len(user_data) > 0:
-            # Check recent work hours
-            user_data['timestamp'] = pd.to_datetime(user_data['timestamp'])
-            today = user_data[user_data['timestamp'].dt.date == user_data['timestamp'].dt.date.max()]
+        Args:
+            features: Output of build_features
+            k: Only return the k most important recommendations
             
-            work_today = today[today['activity_type'] == 'work']['duration'].sum() / 60
-            breaks_today = len(today[today['activity_type'] == 'break'])
+        Returns:
+            Recommendations ordered by priority, then rule order
+        """
+        ranked = []
+        for position, current in enumerate(self.rules):
+            if any(features.get(name) is None for name in current.requires):
+                continue
             
-            # Break recommendation
-            if work_today > 2 and breaks_today < 2:
-                recommendations.append({
-                    'type': 'break',
-                    'priority': 'medium',
-                    'icon': '☕',
-                    'title': 'Time for a Break',
-                    'message': f"You've worked {work_today:.1f} hours with only {breaks_today} breaks. Take a 5-10 minute break!",
-                    'action': 'take_break',
-                    'data': {'work_hours': work_today, 'breaks': breaks_today}
-                })
+            output = current.build(features)
+            if output is None:
+                continue
+            if isinstance(output, dict):
+                output = [output]
             
-            # Positive reinforcement
-            avg_productivity = today['productivity_score'].mean()
-            if avg_productivity > 7:
-                recommendations.append({
-                    'type': 'encouragement',
-                    'priority': 'low',
-                    'icon': '🎉',
-                    'title': 'Great Work Today!',
-                    'message': f"Your productivity is {avg_productivity:.1f}/10 - above your average! Keep it up!",
-                    'action': 'celebrate',
-                    'data': {'score': avg_productivity}
-                })
-        
-        # Sort by priority
-        priority_order = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
-        recommendations.sort(key=lambda x: priority_order.get(x['priority'], 99))
+            for offset, recommendation in enumerate(output):
+                rank = PRIORITY_ORDER.get(recommendation['priority'], 99)
+                ranked.append((rank, position, offset, recommendation))
         
-        return recommendations
+        if k is not None:
+            ranked = heapq.nsmallest(k, ranked, key=lambda item: item[:3])
+        else:
+            ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked]
 
 
 # Test the engine
@@ -0,0 +1,100 @@
+"""
+Check PatternRecognizer's cluster labels against known archetypes
+
+Generates synthetic users whose archetype is known (morning, night_owl,
+consistent; see generate_synthetic_data.py), fits the pattern model on
+them and checks each archetype is given its matching label. Exits
+non-zero when any archetype falls below --min-accuracy for any seed.
+
+Usage:
+    python scripts/check_pattern_labels.py
+    python scripts/check_pattern_labels.py --users 2000 --days 90 --seeds 1,2,3
+"""
+import sys
+import os
+import argparse
+import contextlib
+import io
+from collections import Counter
+
+import pandas as pd
+
+# Fix imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.pattern_recognition import PatternRecognizer
+from generate_synthetic_data import generate_chunks
+
+# Label each archetype should be given
+EXPECTED_LABELS = {
+    'morning': "Morning Person",
+    'night_owl': "Night Owl",
+    'consistent': "Consistent Worker",
+}
+
+
+def check_labels(users, days, seed):
+    """
+    Fit on one synthetic population and score the labels
+
+    Returns:
+        Dict of archetype -> (share labelled as expected, Counter of labels given)
+    """
+    chunks = list(generate_chunks(users, days, ','.join(EXPECTED_LABELS), seed=seed, end='2025-01-01'))
+    df = pd.concat([chunk for chunk, _ in chunks], ignore_index=True)
+    archetypes = {user_id: name for _, names in chunks for user_id, name in names.items()}
+    frames_by_user = dict(tuple(df.groupby('user_id')))
+
+    recognizer = PatternRecognizer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        recognizer.fit_frames(frames_by_user)
+    patterns = recognizer.predict_patterns(frames_by_user)
+
+    given = {name: Counter() for name in EXPECTED_LABELS}
+    for user_id, pattern in patterns.items():
+        given[archetypes[user_id]][pattern['pattern_type']] += 1
+
+    return {
+        name: (labels[EXPECTED_LABELS[name]] / max(1, sum(labels.values())), labels)
+        for name, labels in given.items()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check pattern labels against synthetic archetypes")
+    parser.add_argument('--users', type=int, default=600, help="Synthetic users per seed (default: 600)")
+    parser.add_argument('--days', type=int, default=60, help="Days of history per user (default: 60)")
+    parser.add_argument('--seeds', default='7,42', help="Comma-separated seeds (default: 7,42)")
+    parser.add_argument('--min-accuracy', type=float, default=0.95,
+                        help="Share of each archetype that must get its label (default: 0.95)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("="*60)
+    print("🔍 Pattern Label Check")
+    print("="*60)
+
+    failures = 0
+    for seed in [int(seed) for seed in args.seeds.split(',') if seed.strip()]:
+        print()
+        print(f"🎲 Seed {seed}: {args.users} users x {args.days} days")
+        for name, (accuracy, labels) in check_labels(args.users, args.days, seed).items():
+            ok = accuracy >= args.min_accuracy
+            failures += not ok
+            given = ', '.join(f"{label}: {count}" for label, count in labels.most_common())
+            print(f"   {'✅' if ok else '❌'} {name:<12}{accuracy:>7.1%}  ({given})")
+
+    print()
+    if failures:
+        print(f"❌ {failures} archetype(s) below {args.min_accuracy:.0%}")
+        return 1
+    print("✅ Every archetype got its label")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
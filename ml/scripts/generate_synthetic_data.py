@@ -0,0 +1,454 @@
+"""
+Generate synthetic activity data at load-testing scale
+
+Builds many users' histories at once with NumPy (no per-row Python) from
+behaviour archetypes, and streams them out chunk by chunk so memory stays
+bounded however many rows are written:
+  - Parquet (.parquet), one row group per chunk - needs pyarrow
+  - CSV (.csv), appended chunk by chunk
+  - a columnar activity store directory (--store, see models/activity_store.py)
+  - straight into the backend's activities table (--database-url)
+
+The same --seed and --end always produce the same rows.
+
+Usage:
+    python scripts/generate_synthetic_data.py --users 10000 --days 365 --output data/synthetic_activities.parquet
+    python scripts/generate_synthetic_data.py --users 50 --days 90 --output '' --database-url sqlite:///../backend/rehabit.db
+"""
+import sys
+import os
+import argparse
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Column layout of demo_activities.csv and the activities table
+COLUMNS = ['user_id', 'timestamp', 'activity_type', 'duration', 'productivity_score', 'focus_level', 'notes']
+
+# One recurring activity in an archetype's day: start hour, type, baseline
+# score, duration range in minutes, chance it happens on a working day, note
+Slot = namedtuple('Slot', ['hour', 'activity_type', 'score', 'min_duration', 'max_duration', 'probability', 'note'])
+
+# Start times are jittered by up to this many minutes; slots are at least
+# twice this far apart, so each user's rows come out in time order
+JITTER_MINUTES = 10
+
+# Each user's whole schedule is shifted by up to this many minutes
+USER_SHIFT_MINUTES = 45
+
+# Users drawn from one random stream; chunks are made of whole blocks, so
+# the output doesn't depend on the chunk size
+BLOCK_USERS = 64
+
+ARCHETYPES = {
+    # Peaks early, dips after lunch (the demo user)
+    'morning': {
+        'slots': [
+            Slot(9.0, 'work', 9.0, 100, 150, 1.0, 'Morning deep work session'),
+            Slot(10.5, 'break', 5.0, 15, 15, 0.9, 'Coffee break'),
+            Slot(11.0, 'work', 8.0, 60, 90, 1.0, 'Continued work before lunch'),
+            Slot(12.5, 'break', 4.0, 45, 75, 0.9, 'Lunch break'),
+            Slot(14.0, 'work', 5.0, 60, 90, 1.0, 'Post-lunch session'),
+            Slot(16.0, 'meeting', 6.0, 30, 90, 0.6, 'Team meeting'),
+            Slot(17.5, 'exercise', 6.0, 30, 60, 0.6, 'Gym / Exercise session'),
+        ],
+    },
+    # Slow start, best work late in the evening
+    'night_owl': {
+        'slots': [
+            Slot(11.0, 'work', 4.5, 45, 90, 1.0, 'Slow start'),
+            Slot(13.0, 'break', 4.0, 30, 60, 0.9, 'Lunch break'),
+            Slot(15.0, 'meeting', 6.0, 30, 60, 0.6, 'Team meeting'),
+            Slot(17.0, 'break', 5.0, 15, 30, 0.8, 'Coffee break'),
+            Slot(20.0, 'work', 8.0, 90, 150, 1.0, 'Evening deep work'),
+            Slot(22.5, 'work', 8.5, 60, 120, 0.8, 'Late night focus'),
+        ],
+    },
+    # Same score all day, regular breaks
+    'consistent': {
+        'slots': [
+            Slot(9.0, 'work', 7.0, 60, 90, 1.0, 'Morning work'),
+            Slot(10.5, 'break', 6.0, 10, 15, 1.0, 'Short break'),
+            Slot(11.0, 'work', 7.0, 60, 90, 1.0, 'Late morning work'),
+            Slot(12.5, 'break', 6.0, 30, 45, 1.0, 'Lunch break'),
+            Slot(14.0, 'work', 7.0, 60, 90, 1.0, 'Afternoon work'),
+            Slot(15.5, 'break', 6.0, 10, 15, 1.0, 'Short break'),
+            Slot(16.0, 'work', 7.0, 60, 90, 1.0, 'Wrap-up'),
+        ],
+        'score_noise': 0.6,
+        'day_noise': 0.4,
+    },
+    # Long days, few breaks, works weekends and wears down over time
+    'burnout': {
+        'slots': [
+            Slot(7.5, 'work', 7.0, 120, 180, 1.0, 'Early start'),
+            Slot(10.5, 'work', 6.5, 90, 150, 1.0, 'Back-to-back work'),
+            Slot(13.0, 'break', 4.0, 10, 20, 0.3, 'Quick lunch'),
+            Slot(13.5, 'work', 6.0, 120, 180, 1.0, 'Afternoon grind'),
+            Slot(17.0, 'meeting', 5.0, 60, 90, 0.8, 'Late meeting'),
+            Slot(20.0, 'work', 5.0, 90, 150, 0.9, 'Evening catch-up'),
+            Slot(22.5, 'work', 4.5, 60, 120, 0.7, 'Late night work'),
+        ],
+        'weekend_work': 0.8,
+        'fatigue': 3.0,
+    },
+}
+
+# Defaults for archetype settings left out above
+ARCHETYPE_DEFAULTS = {
+    'score_noise': 1.2,   # per-activity score noise (std)
+    'day_noise': 1.0,     # good day / bad day swing shared by a day's activities
+    'user_noise': 0.5,    # per-user score bias
+    'weekend_work': 0.3,  # chance of working on a weekend day
+    'fatigue': 0.0,       # score lost between the first and last day
+}
+
+
+def parse_archetypes(spec):
+    """
+    Parse 'morning,night_owl' or 'morning=3,burnout=1' into normalized weights
+
+    Returns:
+        (names, probabilities)
+    """
+    names, weights = [], []
+    for part in spec.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ARCHETYPES:
+            raise ValueError(f"Unknown archetype '{name}' (choose from {', '.join(ARCHETYPES)})")
+        names.append(name)
+        weights.append(float(weight) if weight else 1.0)
+
+    weights = np.array(weights)
+    return names, weights / weights.sum()
+
+
+def generate_archetype(archetype, user_ids, start, days, rng):
+    """
+    Every activity of a group of same-archetype users, as flat columns
+
+    Args:
+        archetype: Key of ARCHETYPES
+        user_ids: Array of user ids
+        start: Midnight of the first day
+        days: Days of history per user
+        rng: numpy Generator
+
+    Returns:
+        DataFrame in COLUMNS layout, ordered by user then time
+    """
+    settings = {**ARCHETYPE_DEFAULTS, **ARCHETYPES[archetype]}
+    slots = settings['slots']
+    users = len(user_ids)
+    shape = (users, days, len(slots))
+
+    hours, types, scores, min_durations, max_durations, probabilities, notes = (
+        np.array(column) for column in zip(*slots)
+    )
+
+    # Which days are worked and which slots happen on them
+    day_index = np.arange(days)
+    is_weekend = (start.weekday() + day_index) % 7 >= 5
+    works = rng.random((users, days)) < np.where(is_weekend, settings['weekend_work'], 1.0)
+    happens = works[:, :, None] & (rng.random(shape) < probabilities)
+
+    # Start times in minutes since `start`
+    user_shift = rng.integers(-USER_SHIFT_MINUTES, USER_SHIFT_MINUTES + 1, users)
+    minutes = (
+        day_index[None, :, None] * 24 * 60
+        + np.round(hours * 60).astype(np.int64)
+        + user_shift[:, None, None]
+        + rng.integers(-JITTER_MINUTES, JITTER_MINUTES + 1, shape)
+    )
+
+    # Scores: slot baseline + user bias + day quality - accumulated fatigue + noise
+    fatigue = settings['fatigue'] * day_index / max(days - 1, 1)
+    score = (
+        scores
+        + rng.normal(0, settings['user_noise'], users)[:, None, None]
+        + rng.normal(0, settings['day_noise'], (users, days))[:, :, None]
+        - fatigue[None, :, None]
+        + rng.normal(0, settings['score_noise'], shape)
+    )
+    score = np.clip(np.round(score), 1, 10).astype(np.int64)
+
+    duration = min_durations + np.floor(
+        rng.random(shape) * (max_durations - min_durations + 1)
+    ).astype(np.int64)
+
+    slot = np.broadcast_to(np.arange(len(slots)), shape)[happens]
+    score = score[happens]
+    return pd.DataFrame({
+        'user_id': np.broadcast_to(np.asarray(user_ids)[:, None, None], shape)[happens],
+        'timestamp': start + pd.to_timedelta(minutes[happens], unit='m'),
+        'activity_type': types[slot],
+        'duration': duration[happens],
+        'productivity_score': score,
+        'focus_level': np.where(score >= 7, 'high', np.where(score >= 5, 'medium', 'low')),
+        'notes': notes[slot],
+    }, columns=COLUMNS)
+
+
+def generate_chunks(users, days, archetypes='morning,night_owl,consistent,burnout', seed=42,
+                    end=None, first_user_id=1, chunk_rows=1_000_000):
+    """
+    Yield the synthetic dataset as DataFrames of about chunk_rows rows
+
+    Args:
+        users: Number of users
+        days: Days of history per user
+        archetypes: Archetype mix, see parse_archetypes
+        seed: Random seed
+        end: Last day of history (default: today)
+        first_user_id: id of the first user; the rest are consecutive
+        chunk_rows: Target rows per chunk (whole blocks of BLOCK_USERS users)
+
+    Yields:
+        (DataFrame in COLUMNS layout, {user_id: archetype} for its users)
+    """
+    names, probabilities = parse_archetypes(archetypes)
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    start = end - pd.Timedelta(days=days - 1)
+
+    # Archetypes are drawn up front so they don't depend on the chunk size
+    assigned = np.random.default_rng(seed).choice(len(names), size=users, p=probabilities)
+    user_ids = np.arange(first_user_id, first_user_id + users)
+
+    max_slots = max(len(ARCHETYPES[name]['slots']) for name in names)
+    blocks_per_chunk = max(1, chunk_rows // (days * max_slots * BLOCK_USERS))
+    users_per_chunk = blocks_per_chunk * BLOCK_USERS
+
+    for first in range(0, users, users_per_chunk):
+        frames = []
+        for block in range(first, min(first + users_per_chunk, users), BLOCK_USERS):
+            block_ids = user_ids[block:block + BLOCK_USERS]
+            block_archetypes = assigned[block:block + BLOCK_USERS]
+            rng = np.random.default_rng([seed, block // BLOCK_USERS])
+            frames.extend(
+                generate_archetype(names[index], block_ids[block_archetypes == index], start, days, rng)
+                for index in np.unique(block_archetypes)
+            )
+        chunk = pd.concat(frames, ignore_index=True)
+
+        # Back to user order; a stable sort keeps each user's rows in time order
+        order = np.argsort(chunk['user_id'].to_numpy(), kind='stable')
+        chunk = chunk.iloc[order].reset_index(drop=True)
+
+        chunk_ids = user_ids[first:first + users_per_chunk]
+        chunk_archetypes = assigned[first:first + users_per_chunk]
+        yield chunk, {int(user_id): names[index] for user_id, index in zip(chunk_ids, chunk_archetypes)}
+
+
+class ParquetSink:
+    """Parquet file written one row group per chunk"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow (or use a .csv output)")
+
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.writer = None
+
+    def write(self, chunk, archetypes):
+        table = self.pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression='snappy')
+        self.writer.write_table(table, row_group_size=len(chunk))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def __str__(self):
+        return self.path
+
+
+class CsvSink:
+    """CSV file appended chunk by chunk"""
+
+    def __init__(self, path):
+        self.path = path
+        self.started = False
+
+    def write(self, chunk, archetypes):
+        chunk.to_csv(self.path, mode='a' if self.started else 'w', header=not self.started,
+                     index=False, date_format='%Y-%m-%d %H:%M:%S')
+        self.started = True
+
+    def close(self):
+        pass
+
+    def __str__(self):
+        return self.path
+
+
+class StoreSink:
+    """Columnar ActivityStore, one partition per user (chunks hold whole users)"""
+
+    def __init__(self, path):
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        try:
+            from models.activity_store import ActivityStore
+        except ImportError:
+            raise SystemExit("❌ The activity store needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.store = ActivityStore(path)
+
+    def write(self, chunk, archetypes):
+        self.store.import_frame(chunk)
+
+    def close(self):
+        pass
+
+    def __str__(self):
+        return self.path
+
+
+class DatabaseSink:
+    """
+    Rows inserted into the backend's activities table (created by the backend's init_db)
+
+    Missing users rows are created as "Synthetic <archetype> <id>". The
+    activity_daily / activity_hourly rollups and hourly sketches are not
+    updated; rebuild them afterwards (see the hint printed at the end).
+    """
+
+    def __init__(self, url):
+        from sqlalchemy import MetaData, create_engine
+
+        self.url = url
+        self.engine = create_engine(url)
+        self.metadata = MetaData()
+        try:
+            self.metadata.reflect(self.engine, only=['users', 'activities'])
+        except Exception as e:
+            raise SystemExit(f"❌ {e} - start the backend once so init_db creates the tables")
+        self.users = self.metadata.tables['users']
+        self.activities = self.metadata.tables['activities']
+
+    def write(self, chunk, archetypes):
+        from sqlalchemy import insert, select
+
+        records = chunk.to_dict('records')
+        for record in records:
+            record['timestamp'] = record['timestamp'].to_pydatetime()
+
+        with self.engine.begin() as conn:
+            existing = set(conn.scalars(
+                select(self.users.c.id).where(self.users.c.id.in_(list(archetypes)))
+            ))
+            now = datetime.now()
+            new_users = [
+                {
+                    'id': user_id,
+                    'name': f"Synthetic {archetype.replace('_', ' ')} {user_id}",
+                    'email': f"synthetic{user_id}@example.com",
+                    'created_at': now,
+                }
+                for user_id, archetype in archetypes.items() if user_id not in existing
+            ]
+            if new_users:
+                conn.execute(insert(self.users), new_users)
+            conn.execute(insert(self.activities), records)
+
+    def close(self):
+        self.engine.dispose()
+
+    def __str__(self):
+        return self.url.split('@')[-1]
+
+
+def make_sink(path):
+    """Pick a sink from the output file extension"""
+    if path.endswith('.parquet'):
+        return ParquetSink(path)
+    if path.endswith('.csv'):
+        return CsvSink(path)
+    raise SystemExit(f"❌ Don't know how to write '{path}' (use .parquet or .csv)")
+
+
+def parse_args():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    default_output = os.path.join(os.path.dirname(script_dir), 'data', 'synthetic_activities.parquet')
+
+    parser = argparse.ArgumentParser(description="Generate synthetic activity data for load testing")
+    parser.add_argument('--users', type=int, default=100, help="Number of users (default: 100)")
+    parser.add_argument('--days', type=int, default=90, help="Days of history per user (default: 90)")
+    parser.add_argument(
+        '--archetypes',
+        default='morning,night_owl,consistent,burnout',
+        help=f"Archetype mix, optionally weighted like morning=3,burnout=1 (choices: {', '.join(ARCHETYPES)})"
+    )
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument('--end', help="Last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument('--first-user-id', type=int, default=1, help="id of the first user (default: 1)")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000,
+                        help="Rows generated and written at a time (default: 1000000)")
+    parser.add_argument('--output', default=default_output,
+                        help="Output .parquet or .csv file ('' to skip; default: data/synthetic_activities.parquet)")
+    parser.add_argument('--store', help="Also write the rows to this columnar activity store directory")
+    parser.add_argument('--database-url', help="Also insert the rows into this database's activities table")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("="*60)
+    print("🎲 REHABIT - SYNTHETIC DATA GENERATOR")
+    print("="*60)
+    print()
+
+    sinks = []
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        sinks.append(make_sink(args.output))
+    if args.store:
+        sinks.append(StoreSink(args.store))
+    if args.database_url:
+        sinks.append(DatabaseSink(args.database_url))
+    if not sinks:
+        raise SystemExit("❌ Nothing to write: pass --output, --store and/or --database-url")
+
+    print(f"📊 Generating {args.users} users x {args.days} days ({args.archetypes}, seed {args.seed})...")
+
+    start = time.perf_counter()
+    rows = 0
+    archetype_counts = {}
+    try:
+        for chunk, archetypes in generate_chunks(
+            args.users, args.days, args.archetypes, args.seed, args.end,
+            args.first_user_id, args.chunk_rows
+        ):
+            for sink in sinks:
+                sink.write(chunk, archetypes)
+            rows += len(chunk)
+            for archetype in archetypes.values():
+                archetype_counts[archetype] = archetype_counts.get(archetype, 0) + 1
+            print(f"   {rows:,} rows ({time.perf_counter() - start:.1f}s)")
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    print()
+    print(f"✅ Generated {rows:,} activities in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"👥 Archetypes: {archetype_counts}")
+    for sink in sinks:
+        print(f"📁 Saved to: {sink}")
+
+    if args.database_url:
+        print()
+        print("📝 Rebuild rollups and sketches for the new rows (from backend/):")
+        print("   python -m app.services.rollups && python -m app.services.sketches")
+
+
+if __name__ == "__main__":
+    main()
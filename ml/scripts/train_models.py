@@ -1,68 +1,394 @@
-
 """
 Train all ML models at once
+
+Trains the global models on the whole dataset, then fans per-user fits
+out over a process pool. Users whose data fingerprint (row count and
+newest timestamp) matches their last saved artifacts are skipped, and a
+manifest of what was (re)trained is written next to the models.
 """
 import sys
 import os
+import argparse
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
 
 # Fix imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from models.productivity_predictor import ProductivityPredictor
+from models.productivity_predictor import ProductivityPredictor, FORECASTERS
 from models.pattern_recognition import PatternRecognizer
 from models.anomaly_detection import AnomalyDetector
+from models.features import prepare_features
+
+MANIFEST_FILE = 'manifest.json'
+
+# Key of the global models in the manifest
+GLOBAL_KEY = 'global'
+
+# Below these a personal model is noise; the user keeps the global one
+MIN_USER_ACTIVITIES = 20
+MIN_USER_DAYS = 7
+
+# Per-user fits queued per worker; frames are only loaded when their fit is
+# queued, so memory doesn't grow with the number of users to retrain
+TASKS_PER_WORKER = 2
+
+# Every column a model trains on; stores skip reading the rest (e.g. notes)
+TRAINING_COLUMNS = list(dict.fromkeys(
+    ['user_id'] + ProductivityPredictor.COLUMNS + PatternRecognizer.COLUMNS + AnomalyDetector.COLUMNS
+))
+
+
+class CsvSource:
+    """Activities from a CSV in demo_activities.csv layout"""
+
+    def __init__(self, path):
+        self.path = path
+        self.df = pd.read_csv(path)
+        self.df['timestamp'] = pd.to_datetime(self.df['timestamp'], format='ISO8601')
+        self._rows = None
+
+    def __str__(self):
+        return self.path
+
+    def fingerprints(self):
+        """user_id -> (row count, max timestamp) for every user"""
+        stats = self.df.groupby('user_id')['timestamp'].agg(['size', 'max'])
+        return {
+            int(user_id): fingerprint(row['size'], row['max'])
+            for user_id, row in stats.iterrows()
+        }
+
+    def load_all(self):
+        return self.df
+
+    def load_user(self, user_id):
+        # Row positions only; each user's frame is copied out when asked for
+        if self._rows is None:
+            self._rows = self.df.groupby('user_id').indices
+        return self.df.iloc[self._rows[user_id]].reset_index(drop=True)
+
+
+class DatabaseSource:
+    """Activities from the backend's activities table"""
+
+    def __init__(self, url):
+        # Only needed when training from the database
+        from sqlalchemy import create_engine
+        self.url = url
+        self.engine = create_engine(url)
+
+    def __str__(self):
+        return self.url.split('@')[-1]
+
+    def fingerprints(self):
+        """user_id -> (row count, max timestamp), computed by the database"""
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT user_id, COUNT(*), MAX(timestamp) FROM activities GROUP BY user_id"
+            )).all()
+        return {int(user_id): fingerprint(count, newest) for user_id, count, newest in rows}
+
+    def load_all(self):
+        return self._read("SELECT * FROM activities")
+
+    def load_user(self, user_id):
+        return self._read(f"SELECT * FROM activities WHERE user_id = {int(user_id)}")
+
+    def _read(self, query):
+        df = pd.read_sql(query, self.engine)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        return df
+
+
+class StoreSource:
+    """Activities from a columnar ActivityStore (memory-mapped, training columns only)"""
+
+    def __init__(self, path):
+        # Only needed when training from a store (requires pyarrow)
+        from models.activity_store import ActivityStore
+        self.path = path
+        self.store = ActivityStore(path)
+
+    def __str__(self):
+        return self.path
+
+    def fingerprints(self):
+        return {
+            user_id: fingerprint(*self.store.fingerprint(user_id))
+            for user_id in self.store.user_ids()
+        }
+
+    def load_all(self):
+        return self.store.read_users(columns=TRAINING_COLUMNS)
+
+    def load_user(self, user_id):
+        return self.store.read_user(user_id, columns=TRAINING_COLUMNS)
+
+
+def fingerprint(rows, newest):
+    """Manifest form of a data fingerprint"""
+    return {
+        'rows': int(rows),
+        'max_timestamp': None if pd.isna(newest) else pd.Timestamp(newest).isoformat()
+    }
+
+
+def is_current(entry, data_fingerprint, forecaster, directory):
+    """True if a manifest entry was trained on exactly this data and its artifacts exist"""
+    if entry is None or entry.get('forecaster') != forecaster:
+        return False
+    if (entry.get('rows'), entry.get('max_timestamp')) != (
+        data_fingerprint['rows'], data_fingerprint['max_timestamp']
+    ):
+        return False
+    return all(os.path.exists(os.path.join(directory, name)) for name in entry.get('models', []))
+
+
+def load_manifest(models_dir):
+    path = os.path.join(models_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'users': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(models_dir, manifest):
+    """Write the manifest atomically so a crashed run never leaves it half-written"""
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def train_global(df, models_dir, forecaster, changed_users=None, new_users=()):
+    """
+    Train the shared models on everyone's data
+
+    Args:
+        df: Every user's activities
+        models_dir: Where the global artifacts live
+        forecaster: Productivity forecaster backend
+        changed_users: Users whose data changed; when given, an existing
+            pattern model is refreshed with their profiles (taken from df)
+            instead of refit over the whole population
+        new_users: Those of changed_users no earlier run trained on
+    """
+    # Parse once; all three models read the same prepared frame
+    df = prepare_features(df)
+
+    predictor = ProductivityPredictor(forecaster=forecaster)
+    predictor.fit(predictor.prepare_data(df))
+    predictor.save_model(os.path.join(models_dir, 'productivity_model.pkl'))
+
+    pattern_path = os.path.join(models_dir, 'pattern_model.pkl')
+    recognizer = PatternRecognizer()
+    if changed_users is not None and os.path.exists(pattern_path):
+        recognizer.load_model(pattern_path)
+    if changed_users is not None and recognizer.can_refresh():
+        # One profile (24 values) per user is all that is kept; users already
+        # counted in the scaler must not be counted again
+        rows = df.groupby('user_id').indices
+        new_profiles, seen_profiles = [], []
+        for user_id in changed_users:
+            profile = recognizer.user_profiles({user_id: df.iloc[rows[user_id]]}) if user_id in rows else []
+            (new_profiles if user_id in new_users else seen_profiles).extend(profile)
+        new_profiles = np.array(new_profiles).reshape(-1, 24)
+        profiles = np.vstack([new_profiles, np.array(seen_profiles).reshape(-1, 24)])
+        if len(profiles):
+            is_new = np.arange(len(profiles)) < len(new_profiles)
+            recognizer.partial_fit(profiles, is_new=is_new)
+        print(f"🔄 Pattern model refreshed with {len(profiles)} changed users ({len(new_profiles)} new)")
+    else:
+        recognizer.fit_frame(df)
+    recognizer.save_model(pattern_path)
+
+    detector = AnomalyDetector()
+    detector.fit_daily(detector.prepare_daily_features(df))
+    detector.save_model(os.path.join(models_dir, 'anomaly_model.pkl'))
+
+    return ['productivity_model.pkl', 'pattern_model.pkl', 'anomaly_model.pkl']
+
+
+def train_user(user_id, df, models_dir, forecaster):
+    """
+    Fit one user's personal models (runs in a worker process)
+
+    Only the forecaster and the anomaly detector are personal: the pattern
+    clusters are shared, so users are served the global pattern model.
+
+    Returns:
+        (user_id, list of artifact files written, seconds taken)
+    """
+    start = time.perf_counter()
+    user_dir = os.path.join(models_dir, str(user_id))
+    written = []
+    df = prepare_features(df)
+
+    predictor = ProductivityPredictor(forecaster=forecaster)
+    predictor.fit(predictor.prepare_data(df))
+    predictor.save_model(os.path.join(user_dir, 'productivity_model.pkl'))
+    written.append('productivity_model.pkl')
+
+    detector = AnomalyDetector()
+    daily_df = detector.prepare_daily_features(df)
+    if len(daily_df) >= MIN_USER_DAYS:
+        detector.fit_daily(daily_df)
+        detector.save_model(os.path.join(user_dir, 'anomaly_model.pkl'))
+        written.append('anomaly_model.pkl')
+
+    return user_id, written, time.perf_counter() - start
+
+
+def parse_args():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    ml_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description="Train all Rehabit ML models")
+    parser.add_argument('--data', default=os.path.join(ml_dir, 'data', 'demo_activities.csv'),
+                        help="Activity CSV (ignored with --database-url or --store)")
+    parser.add_argument('--database-url', default=None,
+                        help="Train from the backend's activities table instead of a CSV")
+    parser.add_argument('--store', default=None,
+                        help="Train from a columnar activity store directory (models/activity_store.py)")
+    parser.add_argument('--models-dir', default=os.path.join(ml_dir, 'saved_models'))
+    parser.add_argument('--forecaster', choices=FORECASTERS, default='prophet',
+                        help="Productivity forecaster: Prophet or the online seasonal model")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="Processes used for per-user fits")
+    parser.add_argument('--min-activities', type=int, default=MIN_USER_ACTIVITIES,
+                        help="Users with fewer activities keep the global models")
+    parser.add_argument('--force', action='store_true',
+                        help="Retrain even when the data fingerprint is unchanged")
+    parser.add_argument('--skip-users', action='store_true',
+                        help="Only train the global models")
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
+
     print("="*60)
     print("🤖 REHABIT ML MODEL TRAINING")
     print("="*60)
     print()
-    
-    # Paths
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    ml_dir = os.path.dirname(script_dir)
-    data_path = os.path.join(ml_dir, 'data', 'demo_activities.csv')
-    models_dir = os.path.join(ml_dir, 'saved_models')
-    
+
     # Check data exists
-    if not os.path.exists(data_path):
+    if args.database_url is None and args.store is None and not os.path.exists(args.data):
         print("❌ Demo data not found!")
         print("Run: python scripts/generate_demo_data.py")
         exit(1)
-    
-    print(f"📂 Data: {data_path}")
+
+    if args.database_url:
+        source = DatabaseSource(args.database_url)
+    elif args.store:
+        source = StoreSource(args.store)
+    else:
+        source = CsvSource(args.data)
+    models_dir = args.models_dir
+    started_at = datetime.now()
+    run_start = time.perf_counter()
+
+    print(f"📂 Data: {source}")
     print(f"💾 Models will be saved to: {models_dir}")
     print()
-    
-    # Train Productivity Predictor
-    print("1️⃣  Training Productivity Predictor...")
-    predictor = ProductivityPredictor()
-    predictor.train(data_path)
-    predictor.save_model(os.path.join(models_dir, 'productivity_model.pkl'))
-    print()
-    
-    # Train Pattern Recognizer
-    print("2️⃣  Training Pattern Recognizer...")
-    recognizer = PatternRecognizer()
-    recognizer.train(data_path)
-    recognizer.save_model(os.path.join(models_dir, 'pattern_model.pkl'))
-    print()
-    
-    # Train Anomaly Detector
-    print("3️⃣  Training Anomaly Detector...")
-    detector = AnomalyDetector()
-    detector.train(data_path)
-    detector.save_model(os.path.join(models_dir, 'anomaly_model.pkl'))
+
+    manifest = load_manifest(models_dir)
+    fingerprints = source.fingerprints()
+    retrained, skipped, failed = [], [], {}
+
+    # Users whose data changed since their last saved artifacts
+    users = manifest.setdefault('users', {})
+    stale = []
+    for user_id, data_fingerprint in sorted(fingerprints.items()):
+        if data_fingerprint['rows'] < args.min_activities:
+            continue
+        user_dir = os.path.join(models_dir, str(user_id))
+        if not args.force and is_current(users.get(str(user_id)), data_fingerprint, args.forecaster, user_dir):
+            skipped.append(user_id)
+        else:
+            stale.append(user_id)
+    unchanged = len(skipped)
+
+    # Global models: fingerprint of the whole dataset
+    total = {
+        'rows': sum(f['rows'] for f in fingerprints.values()),
+        'max_timestamp': max((f['max_timestamp'] for f in fingerprints.values() if f['max_timestamp']), default=None)
+    }
+    if not args.force and is_current(manifest.get(GLOBAL_KEY), total, args.forecaster, models_dir):
+        print("⏭️  Global models are up to date")
+        skipped.append(GLOBAL_KEY)
+    else:
+        print("1️⃣  Training global models...")
+        # Refresh patterns incrementally from changed users when their manifest entries are kept current
+        incremental = not args.force and not args.skip_users
+        new_users = {user_id for user_id in stale if str(user_id) not in users}
+        written = train_global(source.load_all(), models_dir, args.forecaster,
+                               stale if incremental else None, new_users)
+        manifest[GLOBAL_KEY] = dict(total, forecaster=args.forecaster, models=written,
+                                    trained_at=datetime.now().isoformat())
+        retrained.append(GLOBAL_KEY)
+        save_manifest(models_dir, manifest)
     print()
-    
+
+    # Per-user models: only users whose data changed
+    if not args.skip_users:
+        print(f"2️⃣  Training {len(stale)} users on {args.workers} workers ({unchanged} unchanged)...")
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            queue = iter(stale)
+            pending = {}
+
+            def submit_next():
+                user_id = next(queue, None)
+                if user_id is not None:
+                    future = pool.submit(train_user, user_id, source.load_user(user_id), models_dir, args.forecaster)
+                    pending[future] = user_id
+
+            for _ in range(args.workers * TASKS_PER_WORKER):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    user_id = pending.pop(future)
+                    submit_next()
+                    try:
+                        _, written, seconds = future.result()
+                    except Exception as e:
+                        failed[str(user_id)] = str(e)
+                        print(f"❌ User {user_id} failed: {e}")
+                        continue
+
+                    users[str(user_id)] = dict(fingerprints[user_id], forecaster=args.forecaster, models=written,
+                                               trained_at=datetime.now().isoformat(),
+                                               seconds=round(seconds, 3))
+                    retrained.append(user_id)
+        print()
+
+    manifest['last_run'] = {
+        'started_at': started_at.isoformat(),
+        'seconds': round(time.perf_counter() - run_start, 3),
+        'forecaster': args.forecaster,
+        'retrained': retrained,
+        'skipped': len(skipped),
+        'failed': failed,
+    }
+    save_manifest(models_dir, manifest)
+
     print("="*60)
-    print("✅ ALL MODELS TRAINED SUCCESSFULLY!")
+    print("✅ TRAINING COMPLETE!" if not failed else f"⚠️  TRAINING FINISHED WITH {len(failed)} FAILURES")
     print("="*60)
     print()
-    print("�� Saved models:")
-    print("  - productivity_model.pkl")
-    print("  - pattern_model.pkl")
-    print("  - anomaly_model.pkl")
+    print(f"🔁 Retrained: {len(retrained)}  ⏭️  Skipped: {len(skipped)}  ❌ Failed: {len(failed)}")
+    print(f"📝 Manifest: {os.path.join(models_dir, MANIFEST_FILE)}")
     print()
     print("🚀 Next step: Test with scripts/test_integration.py")
     print()